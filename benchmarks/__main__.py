@@ -0,0 +1,117 @@
+"""The command line interface of the benchmark suite.
+
+Run `python -m benchmarks run` from the root of the repository to benchmark the whole corpus,
+and `python -m benchmarks compare BASELINE CURRENT` to compare two stored runs.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.corpus import CORPUS
+from benchmarks.runner import run_benchmarks, save_results, compare_results, STAGES
+from benchmarks.synthetic import synthetic_corpus
+from derivix.rendering import RenderSettings, PREVIEW_SETTINGS
+
+RESULTS_PATH = Path(__file__).parent / "results"
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Benchmarks each stage of the derivix pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and store the results as JSON.")
+    run.add_argument(
+        "-o", "--output", type=Path, default=None,
+        help=f"The file to store the results in. Defaults to a file named by the current time in `{RESULTS_PATH}`."
+    )
+    run.add_argument("-r", "--repeat", type=int, default=5, help="The count of timed runs of each stage.")
+    run.add_argument(
+        "--source", choices=("all", "corpus", "synthetic"), default="all",
+        help="Whether to benchmark the curated corpus, the synthetic formulas or both."
+    )
+    run.add_argument(
+        "--symbols", type=int, nargs="+", default=[2, 4, 8],
+        help="The symbol counts of the synthetic formulas."
+    )
+    run.add_argument(
+        "--depths", type=int, nargs="+", default=[2, 4, 6],
+        help="The nesting depths of the synthetic formulas."
+    )
+    run.add_argument("--seed", type=int, default=0, help="The seed of the synthetic formulas.")
+    run.add_argument("-k", "--filter", default=None, help="Only benchmark the cases whose name contains this.")
+    render = run.add_mutually_exclusive_group()
+    render.add_argument(
+        "--mathtext", action="store_true",
+        help="Render with matplotlib's built-in mathtext instead of LaTeX, for machines without a TeX installation."
+    )
+    render.add_argument("--no-render", action="store_true", help="Skip the `render` stage.")
+
+    compare = commands.add_parser("compare", help="Compare the median times of two stored runs.")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument(
+        "--threshold", type=float, default=1.1,
+        help="Report a regression if the current time exceeds the baseline by this factor."
+    )
+    return parser.parse_args(args)
+
+
+def run(args: argparse.Namespace) -> int:
+    cases = dict()
+    if args.source in ("all", "corpus"):
+        cases.update({name: {"formula": formula, "source": "corpus"} for name, formula in CORPUS.items()})
+    if args.source in ("all", "synthetic"):
+        synthetic = synthetic_corpus(tuple(args.symbols), tuple(args.depths), args.seed)
+        cases.update({name: {"formula": formula, "source": "synthetic"} for name, formula in synthetic.items()})
+    if args.filter is not None:
+        cases = {name: case for name, case in cases.items() if args.filter in name}
+
+    settings = None
+    if not args.no_render:
+        settings = PREVIEW_SETTINGS if args.mathtext else RenderSettings()
+
+    results = run_benchmarks(cases, args.repeat, settings, progress=lambda name: print(name, file=sys.stderr))
+    output = args.output or RESULTS_PATH / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    save_results(results, output)
+
+    print(f"{'case':<24}" + "".join(f"{stage:>12}" for stage in STAGES))
+    medians = {(result["case"], result["stage"]): result["median"] for result in results["results"]}
+    for name in cases:
+        row = "".join(
+            f"{medians[name, stage] * 1000:>10.2f}ms" if (name, stage) in medians else f"{'-':>12}"
+            for stage in STAGES
+        )
+        print(f"{name:<24}" + row)
+    print(f"Stored the results in `{output}`.")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    comparisons = compare_results(baseline, current, args.threshold)
+
+    print(f"{'case':<24}{'stage':<10}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for comparison in comparisons:
+        print(
+            f"{comparison['case']:<24}{comparison['stage']:<10}"
+            f"{comparison['baseline'] * 1000:>10.2f}ms{comparison['current'] * 1000:>10.2f}ms"
+            f"{comparison['ratio']:>8.2f}" + ("  slower" if comparison["regression"] else "")
+        )
+    regressions = sum(comparison["regression"] for comparison in comparisons)
+    print(f"{regressions} of {len(comparisons)} timings exceed the threshold of {args.threshold}.")
+    return 1 if regressions else 0
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    args = parse_args(args)
+    if args.command == "run":
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""A curated corpus of formulas as they are commonly used in the evaluation of physics lab experiments.
+
+Each entry maps a descriptive name to its LaTeX formula. The names are used as keys of the benchmark results,
+so they must stay stable; add new formulas instead of changing existing ones.
+"""
+
+CORPUS = {
+    "pendulum_gravity": r"\frac{4 \pi^2 L}{T^2}",
+    "kinetic_energy": r"\frac{1}{2} m v^2",
+    "gravitation": r"\frac{G m M}{r^2}",
+    "ideal_gas_pressure": r"\frac{n R T}{V}",
+    "spring_period": r"2 \pi \sqrt{\frac{m}{k}}",
+    "thin_lens": r"\frac{g b}{g + b}",
+    "projectile_range": r"\frac{v^2 \sin(2 \alpha)}{g}",
+    "coulomb": r"\frac{q Q}{4 \pi \epsilon r^2}",
+    "resistivity": r"\frac{R \pi d^2}{4 l}",
+    "rc_discharge": r"U \exp(-\frac{t}{R C})",
+    "malus": r"I \cos(\theta)^2",
+    "doppler": r"f \frac{c + v}{c - u}",
+    "stokes_viscosity": r"\frac{2 r^2 g \cdot (\rho - \sigma)}{9 v}",
+    "relativistic_energy": r"\frac{m c^2}{\sqrt{1 - \frac{v^2}{c^2}}}",
+    "damped_oscillation": r"A \exp(-\delta t) \cos(\omega t + \phi)",
+    "inclined_plane": r"\frac{m g \sin(\alpha)}{\sqrt{L^2 + (a b)^2}}",
+    "moment_of_inertia": r"\frac{m g r^2 t^2}{2 h} - m r^2",
+    "wheatstone": r"R \frac{l - x}{x}",
+}
@@ -0,0 +1,158 @@
+"""This module times each stage of the derivix pipeline for a set of formulas.
+
+The stages run in the same order as in the application, each on the output of the previous one:
+`parse` (LaTeX to sympy), `derive` (the partial derivations), `cse` (the auxiliary quantities),
+`gaussian` (building the uncertainty expression), `print` (the expression to LaTeX) and `render` (LaTeX to SVG).
+
+Each stage is timed on its own, with the memoization of derivix and sympy's cache cleared before each repetition,
+so the results reflect the cold work of the stage. The peak memory is determined in an additional run under
+`tracemalloc`, as tracing slows down the stage considerably. It only covers allocations of the Python process,
+so the memory of the TeX subprocess is not included.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from typing import Callable, Any, Optional
+
+from sympy import count_ops
+from sympy.core.cache import clear_cache
+
+from derivix.deriver import parse_formula, derive_by_symbols, eliminate_common_subexpressions, \
+    as_gaussian_uncertainty, gaussian_to_latex, latex_to_svg
+from derivix.rendering import RenderSettings
+from derivix.utils.math_util import CONSTANTS
+
+STAGES = ("parse", "derive", "cse", "gaussian", "print", "render")
+PACKAGES = ("sympy", "matplotlib", "antlr4-python3-runtime", "numpy", "PySide6")
+"""The packages whose versions are recorded, as upgrading them is the most likely cause of a change in timing."""
+
+
+def measure(stage: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    """Times `repeat` runs of the `stage` after a warmup run, and determines its peak memory in one more run."""
+    times = list()
+    for index in range(repeat + 1):
+        clear_cache()
+        start = time.perf_counter()
+        stage()
+        if index != 0:
+            times.append(time.perf_counter() - start)
+            # ↑ The first run is the warmup, e.g. to import the modules the stage requires lazily.
+
+    clear_cache()
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "times": times,
+        "median": statistics.median(times),
+        "min": min(times),
+        "peak_bytes": peak,
+    }
+
+
+def benchmark_formula(formula: str, repeat: int, settings: Optional[RenderSettings]) -> dict[str, dict[str, Any]]:
+    """Runs all stages for a single `formula`. Without `settings`, the `render` stage is skipped."""
+    parse = parse_formula.__wrapped__
+    print_ = gaussian_to_latex.__wrapped__
+    # ↑ Bypass the memoization, which would reduce all but the first run to a lookup.
+
+    expression = parse(formula)
+    symbols = sorted(
+        (symbol for symbol in expression.free_symbols if symbol.name not in CONSTANTS), key=lambda sym: sym.name
+    )
+    derivations = derive_by_symbols(expression, symbols)
+    _, reduced = eliminate_common_subexpressions(derivations)
+    gaussian = as_gaussian_uncertainty(reduced)
+    gaussian_latex = print_(gaussian)
+
+    stages = {
+        "parse": lambda: parse(formula),
+        "derive": lambda: derive_by_symbols(expression, symbols),
+        "cse": lambda: eliminate_common_subexpressions(derivations),
+        "gaussian": lambda: as_gaussian_uncertainty(reduced),
+        "print": lambda: print_(gaussian),
+    }
+    if settings is not None:
+        stages["render"] = lambda: latex_to_svg(gaussian_latex, settings, cache=None)
+
+    results = {name: measure(stage, repeat) for name, stage in stages.items()}
+    results["derive"]["symbols"] = len(symbols)
+    results["derive"]["operations"] = sum(count_ops(derivation) for derivation in derivations.values())
+    results["print"]["characters"] = len(gaussian_latex)
+    return results
+
+
+def run_benchmarks(cases: dict[str, dict[str, str]], repeat: int = 5, settings: Optional[RenderSettings] = None,
+                   progress: Optional[Callable[[str], None]] = None) -> dict[str, Any]:
+    """Benchmarks the formulas of all `cases`, which map the name of each case to its `formula` and `source`.
+    Returns the results in the format stored by the suite, see `save_results()`."""
+    results = list()
+    for name, case in cases.items():
+        if progress is not None:
+            progress(name)
+        stages = benchmark_formula(case["formula"], repeat, settings)
+        for stage, result in stages.items():
+            results.append({"case": name, "source": case["source"], "stage": stage, **result})
+    return {"metadata": collect_metadata(repeat, settings), "results": results}
+
+
+def collect_metadata(repeat: int, settings: Optional[RenderSettings]) -> dict[str, Any]:
+    """Describes the environment of a run, so differences between runs can be attributed."""
+    versions = dict()
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "versions": versions,
+        "repeat": repeat,
+        "render": None if settings is None else {"usetex": settings.usetex, "fontsize": settings.fontsize},
+    }
+
+
+def save_results(results: dict[str, Any], file: Path):
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+def compare_results(baseline: dict[str, Any], current: dict[str, Any], threshold: float = 1.1) \
+        -> list[dict[str, Any]]:
+    """Compares the median times of each case and stage that occurs in both runs.
+    Each comparison holds the `ratio` of the current to the baseline time and whether it exceeds the `threshold`."""
+    baseline_times = {(result["case"], result["stage"]): result["median"] for result in baseline["results"]}
+    comparisons = list()
+    for result in current["results"]:
+        key = (result["case"], result["stage"])
+        if key not in baseline_times:
+            continue
+        ratio = result["median"] / baseline_times[key] if baseline_times[key] != 0 else float("inf")
+        comparisons.append({
+            "case": result["case"],
+            "stage": result["stage"],
+            "baseline": baseline_times[key],
+            "current": result["median"],
+            "ratio": ratio,
+            "regression": ratio > threshold,
+        })
+    return comparisons
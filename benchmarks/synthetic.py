@@ -0,0 +1,60 @@
+"""This module generates synthetic formulas, to benchmark how each stage scales with the size of a formula.
+
+The formulas are random, but reproducible for the same parameters and seed, so results of different runs compare.
+"""
+import random
+from typing import Optional
+
+UNARY = (
+    r"\sin(%s)",
+    r"\cos(%s)",
+    r"\exp(%s)",
+    r"\sqrt{%s}",
+    r"\ln(%s)",
+    r"(%s)^2",
+)
+BINARY = (
+    r"%s + %s",
+    r"%s - %s",
+    r"%s \cdot %s",
+    r"\frac{%s}{%s}",
+)
+
+
+def synthetic_formula(symbols: int, depth: int, seed: Optional[int] = 0) -> str:
+    """Generates a LaTeX formula over `symbols` distinct symbols (`x_{1}`, `x_{2}`, ...) with operations
+    nested `depth` levels deep. Each symbol occurs at least once."""
+    if symbols < 1:
+        raise ValueError("A formula requires at least one symbol.")
+    rng = random.Random(seed)
+    names = [f"x_{{{index + 1}}}" for index in range(symbols)]
+    leaves = iter(names)
+
+    def leaf() -> str:
+        return next(leaves, None) or rng.choice(names)
+        # ↑ Use each symbol once before repeating any, so all of them occur.
+
+    def build(level: int) -> str:
+        if level == 0:
+            return leaf()
+        if rng.random() < 0.3:
+            return rng.choice(UNARY) % build(level - 1)
+        return "(" + rng.choice(BINARY) % (build(level - 1), build(level - 1)) + ")"
+
+    formula = build(depth)
+    remaining = list(leaves)
+    if remaining:
+        formula = r" \cdot ".join([formula, *remaining])
+        # ↑ A shallow tree has fewer leaves than symbols, so the remaining ones are multiplied in.
+    return formula
+
+
+def synthetic_corpus(symbol_counts: tuple[int, ...] = (2, 4, 8), depths: tuple[int, ...] = (2, 4, 6),
+                     seed: int = 0) -> dict[str, str]:
+    """Generates a synthetic formula for each combination of symbol count and depth,
+    keyed like `synthetic_s4_d6` for 4 symbols and a depth of 6."""
+    return {
+        f"synthetic_s{symbols}_d{depth}": synthetic_formula(symbols, depth, seed)
+        for symbols in symbol_counts
+        for depth in depths
+    }
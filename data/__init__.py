@@ -3,6 +3,9 @@ from pathlib import Path
 
 from PySide6.QtGui import QPixmap, Qt
 
+_validated: set[type] = set()
+"""The collections whose files were checked already, see `Images.get_path()`."""
+
 
 class Images(Enum):
     def get_pixmap(self, width: int | None = None) -> QPixmap:
@@ -13,6 +16,10 @@ class Images(Enum):
         return pix
 
     def get_path(self) -> Path:
+        if self.__class__ not in _validated:
+            _validated.add(self.__class__)
+            self.__class__.validate_existence()
+            # ↑ Checked on first use instead of on import, so the files are not accessed before the window is built.
         return self.__class__.get_base_folder() / self.value
 
     def get_path_string(self, absolute=True) -> str:
@@ -24,7 +31,8 @@ class Images(Enum):
     @classmethod
     def validate_existence(cls):
         for member in cls:
-            assert member.get_path().exists(), f"The file \"{member.get_path_string()}\" was not found."
+            path = cls.get_base_folder() / member.value
+            assert path.exists(), f"The file \"{path.absolute()}\" was not found."
 
     @classmethod
     def get_default_width(cls):
@@ -63,5 +71,3 @@ class ToolIcons(Images):
     @classmethod
     def get_base_folder(cls):
         return Path() / "data" / "images"
-
-ToolIcons.validate_existence()
@@ -0,0 +1,184 @@
+"""This module contains the headless command line interface to derive and render many formulas at once.
+
+Each formula runs through the same pipeline as in the GUI:
+parsing, the partial derivation by each symbol, the gaussian uncertainty and optionally the rendering.
+The formulas are processed in parallel and each result is written as JSON line as soon as it is done,
+so the order of the output may differ from the input. Use the `index` or `id` of a result to match it.
+
+Multiple formulas over the same symbols can be separated by `;`, they are derived in one pass.
+Their `partials` then hold a list with the derivation of each formula, and `uncertainty` and `svg` hold a list
+with an entry per formula.
+
+Run via `python -m derivix`, see `python -m derivix --help` for the options.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Iterator, Optional, TextIO, Any
+
+from sympy import latex, Tuple
+
+from derivix.deriver import parse_formula, derive_by_symbols, eliminate_common_subexpressions, \
+    as_gaussian_uncertainty, definitions_to_latex, gaussian_to_latex, split_outputs, output_names
+from derivix.rendering import RenderSettings, PREVIEW_SETTINGS
+from derivix.rendering.render import render_svg
+from derivix.utils.math_util import CONSTANTS
+from derivix.utils.processes import get_process_executor
+from derivix.utils.tracing import span
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="derivix",
+        description="Derives the formulas for gaussian uncertainty for many formulas at once "
+                    "and writes the results as JSON lines."
+    )
+    parser.add_argument(
+        "input", nargs="?", default="-",
+        help="The file to read the formulas from, one per line. Reads from stdin if omitted or `-`."
+    )
+    parser.add_argument(
+        "--format", choices=("lines", "jsonl"), default=None,
+        help="`lines` expects one LaTeX formula per line. "
+             "`jsonl` expects one object per line with the keys `formula` and optionally `id` and `symbols`, "
+             "where `symbols` lists the names of the symbols to derive by. "
+             "Defaults to `jsonl` for `.jsonl` files and `lines` otherwise."
+    )
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="The file to write the results to. Writes to stdout if omitted or `-`."
+    )
+    parser.add_argument(
+        "--svg", type=Path, default=None, metavar="FOLDER",
+        help="Also render the uncertainty formula of each input and store it in this folder."
+    )
+    parser.add_argument(
+        "--mathtext", action="store_true",
+        help="Render with matplotlib's built-in mathtext instead of LaTeX, which does not require a LaTeX installation."
+    )
+    parser.add_argument(
+        "-p", "--processes", type=int, default=os.cpu_count() or 1,
+        help="The count of processes to process the formulas in. Defaults to the count of CPUs."
+    )
+    return parser.parse_args(args)
+
+
+def read_jobs(file: TextIO, format_: str) -> Iterator[dict[str, Any]]:
+    """Yields a job for each formula in the `file`. Blank lines and LaTeX comments (`%`) are skipped.
+    A line that is not a valid job yields a job without `formula` but with an `error`, which `process()` reports."""
+    for index, line in enumerate(file):
+        line = line.strip()
+        if line == "" or line.startswith("%"):
+            continue
+        if format_ == "jsonl":
+            try:
+                job = json.loads(line)
+            except ValueError as err:
+                job = {"error": f"Line {index + 1} is not valid JSON: {err}"}
+            else:
+                if not isinstance(job, dict):
+                    job = {"error": f"Line {index + 1} is not a JSON object."}
+                elif "formula" not in job:
+                    job["error"] = f"Line {index + 1} does not specify a `formula`."
+        else:
+            job = {"formula": line}
+        job["index"] = index
+        yield job
+
+
+def process(job: dict[str, Any], settings: Optional[RenderSettings]) -> dict[str, Any]:
+    """Runs the whole pipeline for a single `job` and returns its result.
+    Errors are reported as part of the result, so a single invalid formula does not stop the whole batch."""
+    result = {key: job[key] for key in ("index", "id") if key in job}
+    if "formula" not in job:
+        result["error"] = job["error"]
+        return result
+    result["formula"] = job["formula"]
+    try:
+        formula = parse_formula(job["formula"])
+        symbols = sorted(formula.free_symbols, key=lambda sym: sym.name)
+        if "symbols" in job:
+            symbols = [symbol for symbol in symbols if symbol.name in job["symbols"]]
+        else:
+            symbols = [symbol for symbol in symbols if symbol.name not in CONSTANTS]
+
+        derivations = derive_by_symbols(formula, symbols)
+        definitions, reduced = eliminate_common_subexpressions(derivations)
+        gaussian_formulas = [
+            gaussian_to_latex(as_gaussian_uncertainty(outputs), name)
+            for outputs, name in zip(split_outputs(reduced), output_names(formula))
+        ]
+
+        result["symbols"] = [symbol.name for symbol in symbols]
+        result["partials"] = {symbol.name: _to_latex(derivation) for symbol, derivation in derivations.items()}
+        result["definitions"] = definitions_to_latex(definitions)
+        result["uncertainty"] = _single(formula, gaussian_formulas)
+        if settings is not None:
+            with span("render", formulas=len(gaussian_formulas), usetex=settings.usetex):
+                svgs = [render_svg(gaussian, settings) for gaussian in gaussian_formulas]
+            result["svg"] = _single(formula, svgs)
+    except Exception as err:
+        result["error"] = f"{type(err).__name__}: {err}"
+    return result
+
+
+def _to_latex(derivation) -> str | list[str]:
+    if isinstance(derivation, Tuple):
+        return [latex(output) for output in derivation]
+    return latex(derivation)
+
+
+def _single(formula, outputs: list) -> Any:
+    """Unwraps the `outputs` for a single formula, so its results keep their format."""
+    return outputs if isinstance(formula, Tuple) else outputs[0]
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    args = parse_args(args)
+    format_ = args.format
+    if format_ is None:
+        format_ = "jsonl" if args.input.endswith(".jsonl") else "lines"
+    settings = None
+    if args.svg is not None:
+        settings = PREVIEW_SETTINGS if args.mathtext else RenderSettings()
+        args.svg.mkdir(parents=True, exist_ok=True)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        jobs = read_jobs(source, format_)
+        if args.processes > 1:
+            executor = get_process_executor(args.processes)
+            futures = [executor.submit(process, job, settings) for job in jobs]
+            results = (future.result() for future in as_completed(futures))
+        else:
+            results = (process(job, settings) for job in jobs)
+
+        for result in results:
+            if "svg" in result:
+                name = re.sub(r"[^\w.-]", "_", str(result.get("id", result["index"])))
+                # ↑ The `id` is part of the input, so it must not be able to name a file outside of the folder.
+                if isinstance(result["svg"], list):
+                    files = [args.svg / f"{name}_{index + 1}.svg" for index in range(len(result["svg"]))]
+                    for file, svg in zip(files, result["svg"]):
+                        file.write_bytes(svg)
+                    result["svg"] = [str(file) for file in files]
+                else:
+                    file = args.svg / f"{name}.svg"
+                    file.write_bytes(result["svg"])
+                    result["svg"] = str(file)
+            failed += "error" in result
+            target.write(json.dumps(result) + "\n")
+            target.flush()
+            # ↑ Flush each line, so consumers can process the results while the remaining ones are still running.
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 1 if failed else 0
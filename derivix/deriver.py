@@ -1,24 +1,89 @@
-import uuid
-from dataclasses import dataclass
+import re
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Iterable
+from threading import Lock
+from typing import Optional, Iterable, TYPE_CHECKING, Sequence, Iterator
 
-import matplotlib.pyplot as plt
 import sympy
-from matplotlib import rc
-from sympy import diff, Mul, latex, Symbol
+from sympy import diff, Mul, latex, Symbol, cse, numbered_symbols, count_ops, Add, Pow, Tuple
 from sympy.parsing.latex import parse_latex
 
+from derivix.rendering import RenderSettings
+from derivix.rendering.batch import render_svgs
+from derivix.rendering.cache import RenderCache
+from derivix.rendering.pool import RenderError
+from derivix.rendering.render import render_svg
+from derivix.utils.env import CACHE_PATH, RENDER_CACHE_MAX_BYTES
+from derivix.utils.processes import get_process_executor
+from derivix.utils.tracing import span
+
+if TYPE_CHECKING:
+    from derivix.rendering.pool import RenderPool, RenderTicket
+
+RENDER_CACHE = RenderCache(CACHE_PATH / "renders", RENDER_CACHE_MAX_BYTES)
+PARSE_CACHE_SIZE = 256
+FORMULA_SEPARATOR = ";"
+_SEPARATOR_PATTERN = re.compile(r"(?<!\\)" + re.escape(FORMULA_SEPARATOR))
+"""Matches the `FORMULA_SEPARATOR`, except for the spacing command `\\;`."""
+
 
 @dataclass
 class Formula():
     formula: sympy.core.mul.Mul
     latex: str
-    svg_file: Path
+    svg: Optional[bytes] = None
+    """The content of the rendered SVG, if the formula was rendered."""
+    derivations: "DerivationStore" = field(init=False)
+
+    def __post_init__(self):
+        self.derivations = DerivationStore(self.formula)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_formula(formula: str) -> sympy.Expr:
+    """Parses the LaTeX `formula` into a sympy expression.
+    The results are memoized, as parsing is expensive and the same input is commonly parsed repeatedly,
+    e.g. when the user retypes a formula. Sympy expressions are immutable, so sharing them is safe.
+
+    Multiple formulas over the same symbols can be separated by `FORMULA_SEPARATOR`,
+    they will be parsed into a `Tuple` with one formula per output.
+    """
+    with span("parse", characters=len(formula)) as trace:
+        parts = _SEPARATOR_PATTERN.split(formula)
+        if len(parts) > 1:
+            expression = Tuple(*(parse_latex(part) for part in parts))
+        else:
+            expression = parse_latex(formula)
+        if trace is not None:
+            trace["operations"] = count_ops(expression)
+    return expression
+
+
+def output_names(formula: sympy.Basic) -> list[str]:
+    """Returns the LaTeX name of each output of the `formula`, `f` for a single formula and `f_{1}, f_{2}, ...`
+    for multiple formulas."""
+    if isinstance(formula, Tuple):
+        return [f"f_{{{index + 1}}}" for index in range(len(formula))]
+    return ["f"]
+
+
+def split_outputs(formulas: dict[Symbol, Mul | Tuple]) -> list[dict[Symbol, Mul]]:
+    """Splits the partial derivations of multiple formulas (as produced by `derive_by_symbols` for a `Tuple`)
+    into the partial derivations of each single formula. A single formula is returned as is.
+    Symbols a formula does not depend on are omitted from its derivations, so they add no term to its uncertainty."""
+    if len(formulas) == 0 or not isinstance(next(iter(formulas.values())), Tuple):
+        return [formulas]
+    outputs = len(next(iter(formulas.values())))
+    return [
+        {symbol: formula[index] for symbol, formula in formulas.items() if formula[index] != 0}
+        for index in range(outputs)
+    ]
 
 
 def get_derivations(formula: str):
-    formula = parse_latex(formula)
+    formula = parse_formula(formula)
     symbols = sorted(formula.free_symbols, key=lambda sym: sym.name)
     for sym in symbols:
         diff_formula = diff(formula, sym)
@@ -26,63 +91,305 @@ def get_derivations(formula: str):
 
 
 def get_symbols(formula: str):
-    formula = parse_latex(formula)
+    formula = parse_formula(formula)
     symbols = sorted(formula.free_symbols, key=lambda sym: sym.name)
 
     return symbols
 
 
-def as_gaussian_uncertainty(formulas: dict[Symbol, Mul]) -> str:
-    """Concatenates all formulas to a single formula expressing them all as component of gaussian uncertainty.
+def as_gaussian_uncertainty(formulas: dict[Symbol, Mul]) -> sympy.Expr:
+    """Combines all formulas to a single expression for the gaussian uncertainty.
 
-    This just concatenates them according to gauss, the derivation to get the corresponding
+    This just combines them according to gauss, the derivation to get the corresponding
     formulas must be done beforehand.
 
     `formulas` is expected to be a dict where for each formula, the key is the symbol it was partially derived by.
-    If `formulas` is empty, the resulting formula will be "0".
+    If `formulas` is empty, the resulting expression will be `0`.
+
+    The expression is kept unevaluated, so it prints in the same structure as it was built.
+    Use `.doit()` to evaluate it, e.g. for simplification. For the LaTeX representation, use `gaussian_to_latex()`.
     """
-    latex_formulas = list()
-    if len(formulas) != 0:
+    if len(formulas) == 0:
+        return sympy.Integer(0)
+
+    with span("gaussian", terms=len(formulas)):
+        terms = list()
         for symbol, formula in formulas.items():
-            # region: Format each formula:
+            # region: Build each term:
             # 1. Add the corresponding delta factor
-            # 2. Put it in brackets
-            # 3. Square it
-            formula = latex(formula) + rf"\cdot \Delta {symbol.name}"
-            formula = r"\left(" + formula + r"\right)^2"
-            latex_formulas.append(formula)
+            # 2. Square it
+            delta = uncertainty_symbol(symbol)
+            if formula == 1:
+                term = delta
+            else:
+                term = Mul(formula, delta, evaluate=False)
+            terms.append(Pow(term, 2, evaluate=False))
             # endregion
-        formula_body = (" + ".join(latex_formulas))
-        formula_body = r"\sqrt{" + formula_body + "}"
-    else:
-        formula_body = "0"
+        return sympy.sqrt(Add(*terms, evaluate=False), evaluate=False)
+
+
+def uncertainty_symbol(symbol: Symbol) -> Symbol:
+    """Returns the symbol for the uncertainty of `symbol`, e.g. `Δx` for `x`."""
+    return Symbol(rf"\Delta {latex(symbol)}", nonnegative=True)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def gaussian_to_latex(expression: sympy.Expr, name: str = "f") -> str:
+    """Formats the `expression` from `as_gaussian_uncertainty` as LaTeX equation for the uncertainty of `name`.
+    The results are memoized, as printing large expressions is expensive."""
+    with span("print") as trace:
+        result = rf"\Delta {name} = " + latex(expression, order="none")
+        if trace is not None:
+            trace["characters"] = len(result)
+    return result
+
+
+def eliminate_common_subexpressions(formulas: dict[Symbol, Mul], min_ops: int = 3) \
+        -> tuple[list[tuple[Symbol, Mul]], dict[Symbol, Mul]]:
+    """Pulls subexpressions that repeat within or across the `formulas` out into auxiliary quantities
+    `A_0, A_1, ...`, so large subtrees of the original formula only have to be printed, rendered and evaluated once.
+
+    Returns the definitions of the auxiliary quantities (in the order they depend on each other)
+    and the `formulas` expressed by them, under the same keys.
+
+    Subexpressions with fewer than `min_ops` operations or only a single occurrence will be kept inline,
+    as a separate definition would not make the formulas any simpler.
+    """
+    with span("cse", formulas=len(formulas)) as trace:
+        kept_definitions, reduced = _eliminate_common_subexpressions(formulas, min_ops)
+        if trace is not None:
+            trace["definitions"] = len(kept_definitions)
+    return kept_definitions, reduced
+
+
+def _eliminate_common_subexpressions(formulas: dict[Symbol, Mul], min_ops: int) \
+        -> tuple[list[tuple[Symbol, Mul]], dict[Symbol, Mul]]:
+    exclude = set(formulas).union(*(formula.free_symbols for formula in formulas.values()))
+    # ↑ The auxiliary quantities must not clash with any symbol of the formulas.
+    definitions, reduced = cse(list(formulas.values()), symbols=numbered_symbols("A", exclude=exclude))
+
+    kept_definitions = list()
+    for index, (symbol, expression) in enumerate(definitions):
+        dependents = [e for _, e in definitions[index + 1:]] + [e for r in reduced for e in _outputs(r)]
+        uses = sum(dependent.count(symbol) for dependent in dependents)
+        if count_ops(expression) < min_ops or uses <= 1:
+            inline = {symbol: expression}
+            definitions[index + 1:] = [(s, e.xreplace(inline)) for s, e in definitions[index + 1:]]
+            reduced = [e.xreplace(inline) for e in reduced]
+        else:
+            kept_definitions.append((symbol, expression))
+
+    # region: Rename the remaining quantities, so they are numbered without gaps.
+    printed = {latex(symbol) for symbol in exclude}
+    names = (name for name in numbered_symbols("A") if latex(name) not in printed)
+    # ↑ Compare the printed names, as e.g. the auxiliary `A0` and a symbol `A_0` both print as `A_{0}`.
+    renames = {symbol: next(names) for symbol, _ in kept_definitions}
+    kept_definitions = [(renames[symbol], expression.xreplace(renames)) for symbol, expression in kept_definitions]
+    reduced = [expression.xreplace(renames) for expression in reduced]
+    # endregion
+
+    return kept_definitions, dict(zip(formulas, reduced))
+
+
+def partial_to_latex(formula: Mul | Tuple, symbol: Symbol, derivation: Mul | Tuple) -> list[str]:
+    """Formats the `derivation` of the `formula` by the `symbol` as LaTeX equations, one for each output."""
+    return [
+        rf"\frac{{\partial {name}}}{{\partial {latex(symbol)}}} = {latex(output)}"
+        for name, output in zip(output_names(formula), _outputs(derivation))
+    ]
+
 
-    full_formula = r"\Delta f =  " + formula_body
-    return full_formula
+def _outputs(formula: Mul | Tuple) -> tuple[Mul, ...]:
+    return tuple(formula) if isinstance(formula, Tuple) else (formula,)
 
 
-def derive_by_symbols(formula: Mul, symbols: Iterable[Symbol]) -> dict[Symbol, Mul]:
-    derivations = dict()
-    for symbol in symbols:
-        derivations[symbol] = diff(formula, symbol)
-    return derivations
+def definitions_to_latex(definitions: Iterable[tuple[Symbol, Mul]]) -> list[str]:
+    """Formats each definition from `eliminate_common_subexpressions` as LaTeX equation."""
+    return [f"{latex(symbol)} = {latex(expression)}" for symbol, expression in definitions]
+
+
+def derive_by_symbols(formula: Mul, symbols: Iterable[Symbol], processes: Optional[int] = None) \
+        -> dict[Symbol, Mul]:
+    """Partially derives the `formula` by each of the `symbols`.
+    Returns a dict where for each derivation, the key is the symbol it was derived by.
+    For multiple formulas in a `Tuple`, each derivation is a `Tuple` of the derivations of each formula,
+    use `split_outputs()` to separate them.
+
+    If `processes` is greater than 1, the derivations will be computed in parallel in that many processes.
+    This only pays off for large formulas, as the `formula` and the results must be pickled between the processes.
+    """
+    symbols = list(symbols)
+    with span("derive", symbols=len(symbols), processes=processes):
+        derivations = dict(iter_derivations(formula, symbols, processes))
+    return {symbol: derivations[symbol] for symbol in symbols}
+
+
+def iter_derivations(formula: Mul, symbols: Iterable[Symbol], processes: Optional[int] = None) \
+        -> Iterator[tuple[Symbol, Mul]]:
+    """Like `derive_by_symbols`, but yields each derivation as `(symbol, derivation)` as soon as it is computed,
+    so it can be processed while the others are still computed.
+
+    With `processes`, the derivations are yielded in the order they finish, otherwise in the order of the `symbols`.
+    """
+    symbols = list(symbols)
+    if processes is None or processes <= 1 or len(symbols) <= 1:
+        for symbol in symbols:
+            with span("diff", symbol=symbol.name) as trace:
+                derivation = _derive(formula, symbol)
+                if trace is not None:
+                    trace["operations"] = count_ops(derivation)
+            yield symbol, derivation
+        return
+
+    executor = get_process_executor(processes)
+    futures = {executor.submit(_derive, formula, symbol): symbol for symbol in symbols}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+            # ↑ If the consumer stops early, the derivations that did not start yet are dropped.
+
+
+def _derive(formula: Mul | Tuple, symbol: Symbol) -> Mul | Tuple:
+    """Partially derives the `formula` by the `symbol`. Multiple formulas in a `Tuple` are derived each on its own,
+    so all of them share the same pass over the symbols."""
+    if isinstance(formula, Tuple):
+        return Tuple(*(diff(output, symbol) for output in formula))
+    return diff(formula, symbol)
+
+
+class DerivationStore:
+    """Memoizes the partial derivations of a `formula` per symbol.
+    When deriving by a different set of symbols, only the derivations for symbols that were not derived before
+    will be computed.
+
+    All methods are thread-safe. The lock is not held while deriving,
+    so concurrent derivations by the same symbol might both compute it.
+    """
+
+    def __init__(self, formula: Mul):
+        self.formula = formula
+        self.partials: dict[Symbol, Mul] = dict()
+        self._lock = Lock()
+
+    def derive(self, symbols: Iterable[Symbol], processes: Optional[int] = None) -> dict[Symbol, Mul]:
+        """Returns the partial derivations by the `symbols`, computing only those that are missing.
+        For the parameters, see `derive_by_symbols`."""
+        symbols = list(symbols)
+        with span("derive", symbols=len(symbols), processes=processes):
+            derivations = dict(self.iter_derive(symbols, processes))
+        return {symbol: derivations[symbol] for symbol in symbols}
+
+    def iter_derive(self, symbols: Iterable[Symbol], processes: Optional[int] = None) \
+            -> Iterator[tuple[Symbol, Mul]]:
+        """Like `derive()`, but yields each derivation as soon as it is available, starting with the memoized ones.
+        See `iter_derivations`."""
+        symbols = list(symbols)
+        with self._lock:
+            known = {symbol: self.partials[symbol] for symbol in symbols if symbol in self.partials}
+        yield from known.items()
+
+        missing = [symbol for symbol in symbols if symbol not in known]
+        for symbol, derivation in iter_derivations(self.formula, missing, processes):
+            with self._lock:
+                self.partials[symbol] = derivation
+            yield symbol, derivation
+
+    def snapshot(self) -> dict[Symbol, Mul]:
+        """Returns a copy of all derivations memoized so far."""
+        with self._lock:
+            return dict(self.partials)
+
+    def memoize(self, partials: dict[Symbol, Mul]):
+        """Adds the `partials` computed elsewhere, e.g. restored from a project, so they will not be derived again."""
+        with self._lock:
+            self.partials.update(partials)
+
+
+def latex_to_svg(formula, settings: RenderSettings = RenderSettings(),
+                 cache: Optional[RenderCache] = RENDER_CACHE, pool: Optional["RenderPool"] = None,
+                 ticket: Optional["RenderTicket"] = None) -> bytes:
+    """Renders the `formula` and returns the content of the resulting SVG.
+
+    If a `cache` is passed, the render is looked up there first and new renders will be stored there.
+    Otherwise, the render is kept in memory only.
+    If a `pool` is passed, the render runs in one of its processes instead of the current one.
+    Cancelling the `ticket` raises `RenderCancelled`. With a `pool`, this also kills the render mid-flight.
+    """
+    if cache is not None:
+        with span("render.cache", hit=False) as trace:
+            svg = cache.load(formula, settings)
+            if trace is not None:
+                trace["hit"] = svg is not None
+        if svg is not None:
+            return svg
+
+    with span("render", characters=len(formula), usetex=settings.usetex, pool=pool is not None) as trace:
+        # ↑ With `usetex`, this includes the TeX subprocess.
+        if pool is not None:
+            svg = pool.render(formula, settings, ticket)
+        else:
+            if ticket is not None:
+                ticket.check()
+            svg = render_svg(formula, settings)
+        if trace is not None:
+            trace["bytes"] = len(svg)
+
+    _store_svg(formula, svg, settings, cache)
+    return svg
+
+
+def latex_to_svgs(formulas: Sequence[str], settings: RenderSettings = RenderSettings(),
+                  cache: Optional[RenderCache] = RENDER_CACHE, pool: Optional["RenderPool"] = None,
+                  ticket: Optional["RenderTicket"] = None) -> list[bytes]:
+    """Renders all `formulas` like `latex_to_svg` and returns the content of the resulting SVGs in the same order.
+
+    All formulas that are not cached yet will be compiled in a single TeX run if possible (see `render_svgs`).
+    Otherwise, they will be rendered in parallel if a `pool` is passed.
+    If some of the formulas fail, `RenderError` is raised, which holds the renders of the others.
+    """
+    svgs: dict[str, bytes] = dict()
+    if cache is not None:
+        for formula in formulas:
+            svg = cache.load(formula, settings)
+            if svg is not None:
+                svgs[formula] = svg
+    missing = [formula for formula in dict.fromkeys(formulas) if formula not in svgs]
+    # ↑ Use a dict to drop duplicates while keeping the order.
 
+    errors: dict[str, Exception] = dict()
+    try:
+        rendered = render_svgs(missing, settings, ticket, pool)
+    except RenderError as err:
+        rendered = err.svgs
+        errors = {missing[index]: error for index, error in err.errors.items()}
+    for formula, svg in zip(missing, rendered):
+        if svg is not None:
+            _store_svg(formula, svg, settings, cache)
+            svgs[formula] = svg
 
-def latex_to_svg(formula, folder: Path) -> Optional[Path]:
-    rc('text', usetex=True)
-    fig = plt.figure(figsize=(0.01, 0.01))
-    fig.text(0, 0, f"${formula}$", fontsize=72)
-    file = folder / (str(uuid.uuid4()) + ".svg")
+    if errors:
+        raise RenderError(
+            [svgs.get(formula) for formula in formulas],
+            {index: errors[formula] for index, formula in enumerate(formulas) if formula in errors}
+        )
+        # ↑ The renders that succeeded are cached and passed on, so only the failed formulas need to be reported.
+    return [svgs[formula] for formula in formulas]
 
-    fig.savefig(file, format="svg", transparent=True, bbox_inches='tight', pad_inches=0.1)
-    plt.close(fig)
 
-    return file
+def _store_svg(formula: str, svg: bytes, settings: RenderSettings, cache: Optional[RenderCache]):
+    """Stores the rendered `svg` in the `cache`, so it persists across sessions."""
+    if cache is None:
+        return
+    with span("svg.write", bytes=len(svg)):
+        cache.put(formula, settings, svg)
 
 
 if __name__ == '__main__':
     t_formula = r"x^2 \cdot \frac{e y}{z \cdot \pi \cdot \cos(v) cos(x)}"
-    latex_to_svg("E = mc^2", Path())
+    Path("formula.svg").write_bytes(latex_to_svg("E = mc^2"))
 
     # get_derivations(t_formula)
     # # latex_to_svg(t_formula)
@@ -0,0 +1,229 @@
+"""This module contains the export of a formula and its uncertainty as standalone source code.
+
+The generated code evaluates the formula, its partial derivations and its gaussian uncertainty
+without depending on sympy (or derivix) at runtime:
+- `generate_python()` creates an importable module that only requires NumPy. All functions take scalars or arrays,
+  which are broadcast against each other. With `numba=True`, the functions are compiled by `numba.njit`.
+- `generate_c()` creates C99 source with a function for each quantity, which loops over arrays of `n` inputs.
+
+Subexpressions shared by the expressions of a function are computed once, via `sympy.cse`.
+Symbols whose name is a known constant (e.g. `e`) default to that constant in Python and are inlined in C.
+
+The symbol names of the formula are turned into valid identifiers, e.g. `rho_{1}` into `rho_1`.
+The uncertainty of a measurand `x` is passed as `delta_x`.
+"""
+import keyword
+import math
+import re
+from typing import Mapping, Optional, Iterable
+
+from sympy import Symbol, Dummy, Expr, Tuple, Float, cse, numbered_symbols, sqrt, Add
+from sympy.printing.c import C99CodePrinter
+from sympy.printing.numpy import NumPyPrinter
+
+from derivix.deriver import output_names
+from derivix.utils.math_util import CONSTANTS
+
+_C_RESERVED = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum", "extern",
+    "float", "for", "goto", "if", "inline", "int", "long", "register", "restrict", "return", "short", "signed",
+    "sizeof", "static", "struct", "switch", "typedef", "union", "unsigned", "void", "volatile", "while",
+    "n", "i", "size_t", "y0", "y1", "yn", "j0", "j1", "jn",
+}
+"""Names that must not be used as identifiers in C, in addition to the functions of `math.h`.
+`n` and `i` are the array length and loop index of the generated functions."""
+
+
+class _Names:
+    """Assigns a unique, valid identifier to each symbol and the quantities derived from them."""
+
+    def __init__(self, reserved: Iterable[str]):
+        self.used = set(reserved)
+
+    def identifier(self, name: str) -> str:
+        base = re.sub(r"[\W_]+", "_", name).strip("_") or "x"
+        if base[0].isdigit():
+            base = f"x_{base}"
+        identifier, index = base, 2
+        while identifier in self.used or keyword.iskeyword(identifier):
+            identifier, index = f"{base}_{index}", index + 1
+        self.used.add(identifier)
+        return identifier
+
+
+class _Export:
+    """The quantities to export, with the identifiers for all symbols, shared by the Python and C generators."""
+
+    def __init__(self, formula: Expr | Tuple, partials: Mapping[Symbol, Expr | Tuple], name: str,
+                 reserved: Iterable[str]):
+        self.measurands = tuple(partials)
+        symbols = sorted(
+            formula.free_symbols.union(self.measurands, *(p.free_symbols for p in partials.values())),
+            key=lambda sym: sym.name
+        )
+        self.constants = [symbol for symbol in symbols if symbol.name in CONSTANTS and symbol not in partials]
+        self.inputs = [symbol for symbol in symbols if symbol not in self.constants]
+
+        names = _Names(reserved)
+        self.names = {symbol: names.identifier(symbol.name) for symbol in (*self.inputs, *self.constants)}
+        self.deltas = {symbol: names.identifier(f"delta_{self.names[symbol]}") for symbol in self.measurands}
+        self.outputs = [names.identifier(output.replace("f", name, 1)) for output in output_names(formula)]
+        self.delta_outputs = [names.identifier(f"delta_{output}") for output in self.outputs]
+        self.partial_names = [
+            [names.identifier(f"d{output}_d{self.names[symbol]}") for symbol in self.measurands]
+            for output in self.outputs
+        ]
+        self.single = not isinstance(formula, Tuple)
+
+        self.values = list(formula) if isinstance(formula, Tuple) else [formula]
+        self.jacobian = [
+            [partials[symbol][index] if isinstance(formula, Tuple) else partials[symbol] for symbol in self.measurands]
+            for index in range(len(self.values))
+        ]
+        delta_symbols = {symbol: Dummy(f"delta_{symbol.name}") for symbol in self.measurands}
+        self.uncertainties = [
+            sqrt(Add(*((partial * delta_symbols[symbol]) ** 2 for symbol, partial in zip(self.measurands, row))))
+            for row in self.jacobian
+        ]
+        self.renames = {symbol: Symbol(identifier) for symbol, identifier in self.names.items()}
+        self.renames.update({delta_symbols[symbol]: Symbol(self.deltas[symbol]) for symbol in self.measurands})
+
+
+def generate_python(formula: Expr | Tuple, partials: Mapping[Symbol, Expr | Tuple], numba: bool = False,
+                    latex: Optional[str] = None) -> str:
+    """Returns the source of a Python module that evaluates the `formula` and its uncertainty with NumPy.
+
+    The module provides `value()`, `partials()`, `uncertainty()` and `evaluate()`,
+    which takes the inputs, then the uncertainties of the measurands (the keys of the `partials`)
+    and last the constants, which are optional. For multiple formulas, each function returns a tuple
+    with one result per formula. Constant partial derivations evaluate to scalars.
+
+    :param numba:
+        Whether to compile the functions with `numba.njit`, which then is required by the module.
+    :param latex:
+        The LaTeX source of the `formula`, which is quoted in the docstring of the module.
+    """
+    export = _Export(formula, partials, "f", reserved={"numpy", "numba"})
+    printer = NumPyPrinter({"fully_qualified_modules": True})
+    inputs = [export.names[symbol] for symbol in export.inputs]
+    deltas = [export.deltas[symbol] for symbol in export.measurands]
+    constants = [f"{export.names[symbol]}={CONSTANTS[symbol.name]!r}" for symbol in export.constants]
+
+    def function(name: str, parameters: list[str], expressions: list[Expr], shape: list, doc: str) -> str:
+        lines = ["@numba.njit(cache=True)"] if numba else []
+        lines.append(f"def {name}({', '.join([*parameters, *constants])}):")
+        lines.append(f'    """{doc}"""')
+        definitions, reduced = _cse(expressions, export.renames)
+        for symbol, expression in definitions:
+            lines.append(f"    {symbol} = {printer.doprint(expression)}")
+        results = iter(printer.doprint(expression) for expression in reduced)
+        lines.append(f"    return {_nest(shape, results)}")
+        return "\n".join(lines)
+
+    outputs = ", ".join(export.outputs)
+    values_shape = export.outputs[0] if export.single else export.outputs
+    jacobian_shape = export.partial_names[0] if export.single else export.partial_names
+    functions = [
+        function("value", inputs, export.values, values_shape,
+                 f"Returns {outputs}."),
+        function("partials", inputs, [p for row in export.jacobian for p in row], jacobian_shape,
+                 f"Returns the partial derivations {_nest(jacobian_shape, iter(_flatten(jacobian_shape)))}."),
+        function("uncertainty", [*inputs, *deltas], export.uncertainties,
+                 export.delta_outputs[0] if export.single else export.delta_outputs,
+                 f"Returns the gaussian uncertainty of {outputs}."),
+        function("evaluate", [*inputs, *deltas], [*export.values, *export.uncertainties],
+                 [values_shape, export.delta_outputs[0] if export.single else export.delta_outputs],
+                 f"Returns {outputs} and {'its' if export.single else 'their'} gaussian uncertainty."),
+    ]
+
+    header = [
+        'r"""Evaluates a formula and its gaussian uncertainty, generated by derivix.',
+        "",
+        *([f"Formula: {latex}", ""] if latex is not None else []),
+        f"Inputs: {', '.join(inputs)}",
+        f"Measurands: {', '.join(export.names[symbol] for symbol in export.measurands)}",
+        *([f"Constants: {', '.join(constants)}"] if constants else []),
+        '"""',
+        "import numpy",
+        *(["import numba"] if numba else []),
+        "",
+        f"INPUTS = {tuple(inputs)!r}",
+        f"MEASURANDS = {tuple(export.names[symbol] for symbol in export.measurands)!r}",
+        f"OUTPUTS = {tuple(export.outputs)!r}",
+    ]
+    return "\n".join(header) + "\n\n\n" + "\n\n\n".join(functions) + "\n"
+
+
+def generate_c(formula: Expr | Tuple, partials: Mapping[Symbol, Expr | Tuple], name: str = "f",
+               latex: Optional[str] = None) -> str:
+    """Returns C99 source that evaluates the `formula` and its uncertainty for arrays of `n` inputs.
+
+    Each function is prefixed by `name` and takes `n`, the input arrays, for the uncertainty the arrays of
+    the uncertainties of the measurands, and last the arrays to write each result to:
+    `<name>_value`, `<name>_partials`, `<name>_uncertainty` and `<name>_evaluate`.
+    Link the result against the math library (`-lm`).
+    """
+    export = _Export(formula, partials, name, reserved=_C_RESERVED.union(dir(math)))
+    printer = C99CodePrinter()
+    constants = {symbol: Float(CONSTANTS[symbol.name]) for symbol in export.constants}
+    element = {symbol: Symbol(f"{identifier.name}[i]") for symbol, identifier in export.renames.items()}
+    # ↑ Each input is an array, of which the loop reads the `i`-th element.
+    inputs = [f"const double *{export.names[symbol]}" for symbol in export.inputs]
+    deltas = [f"const double *{export.deltas[symbol]}" for symbol in export.measurands]
+
+    def function(suffix: str, parameters: list[str], expressions: list[Expr], results: list[str], doc: str) -> str:
+        arguments = ", ".join(["size_t n", *parameters, *(f"double *{result}" for result in results)])
+        lines = [f"/* {doc} */", f"void {name}_{suffix}({arguments})", "{", "    for (size_t i = 0; i < n; ++i) {"]
+        expressions = [expression.xreplace(constants) for expression in expressions]
+        definitions, reduced = _cse(expressions, element)
+        for symbol, expression in definitions:
+            lines.append(f"        const double {symbol} = {printer.doprint(expression)};")
+        for result, expression in zip(results, reduced):
+            lines.append(f"        {result}[i] = {printer.doprint(expression)};")
+        lines.extend(["    }", "}"])
+        return "\n".join(lines)
+
+    outputs = ", ".join(export.outputs)
+    partial_names = _flatten(export.partial_names)
+    functions = [
+        function("value", inputs, export.values, export.outputs,
+                 f"Evaluates {outputs}."),
+        function("partials", inputs, [p for row in export.jacobian for p in row], partial_names,
+                 f"Evaluates the partial derivations {', '.join(partial_names)}."),
+        function("uncertainty", [*inputs, *deltas], export.uncertainties, export.delta_outputs,
+                 f"Evaluates the gaussian uncertainty of {outputs}."),
+        function("evaluate", [*inputs, *deltas], [*export.values, *export.uncertainties],
+                 [*export.outputs, *export.delta_outputs],
+                 f"Evaluates {outputs} and {'its' if export.single else 'their'} gaussian uncertainty."),
+    ]
+
+    header = [
+        "/* Evaluates a formula and its gaussian uncertainty, generated by derivix.",
+        *([f" * Formula: {latex}"] if latex is not None else []),
+        f" * Inputs: {', '.join(export.names[symbol] for symbol in export.inputs)}",
+        f" * Measurands: {', '.join(export.names[symbol] for symbol in export.measurands)}",
+        " */",
+        "#include <math.h>",
+        "#include <stddef.h>",
+    ]
+    return "\n".join(header) + "\n\n" + "\n\n".join(functions) + "\n"
+
+
+def _cse(expressions: list[Expr], renames: Mapping[Symbol, Symbol]) -> tuple[list[tuple[Symbol, Expr]], list[Expr]]:
+    """Renames the symbols of the `expressions` and pulls out their common subexpressions."""
+    expressions = [expression.xreplace(renames) for expression in expressions]
+    return cse(expressions, symbols=numbered_symbols("_t"))
+    # ↑ Identifiers of symbols never start with `_`, so the temporaries do not clash with them.
+
+
+def _nest(shape: str | list, results: Iterable[str]) -> str:
+    """Arranges the `results` as tuple in the `shape` of nested lists of names."""
+    if isinstance(shape, str):
+        return next(results)
+    return "(" + ", ".join(_nest(item, results) for item in shape) + ("," if len(shape) == 1 else "") + ")"
+
+
+def _flatten(shape: str | list) -> list[str]:
+    if isinstance(shape, str):
+        return [shape]
+    return [name for item in shape for name in _flatten(item)]
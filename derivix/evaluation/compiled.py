@@ -0,0 +1,234 @@
+"""This module contains the `CompiledFormula`, which evaluates a formula and its uncertainty with NumPy,
+and the `CompiledFormulaSet`, which does the same for multiple formulas over the same symbols."""
+from functools import lru_cache
+from typing import Mapping, Sequence, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike
+from sympy import Symbol, Expr, Tuple, lambdify
+
+from derivix.utils.math_util import CONSTANTS
+
+Values = Mapping[Symbol | str, ArrayLike]
+"""Values for the symbols of a formula, either keyed by the symbol or its name.
+Each value can be a scalar or an array, arrays of different shapes will be broadcast against each other."""
+
+
+class CompiledFormula:
+    """A formula and its partial derivations, compiled into NumPy-vectorized functions.
+    Evaluates the formula and its gaussian uncertainty for whole arrays of measurements in one call.
+
+    The partial derivations are compiled into a single function, so subexpressions they share are evaluated once.
+    Symbols whose name is a known constant (e.g. `pi`) do not need a value, the constant will be used instead.
+
+    Prefer `compile_formula()` over the constructor, as compiling is expensive and its results are cached.
+    """
+
+    def __init__(self, formula: Expr, partials: Mapping[Symbol, Expr]):
+        self.formula = formula
+        self.measurands = tuple(partials)
+        """The symbols with an uncertainty, in the order of the `partials`."""
+        self.symbols = tuple(sorted(
+            formula.free_symbols.union(self.measurands, *(p.free_symbols for p in partials.values())),
+            key=lambda sym: sym.name
+        ))
+        """All symbols that are required as input."""
+
+        self._value = lambdify(self.symbols, formula, modules="numpy", cse=True)
+        self._partials = lambdify(self.symbols, list(partials.values()), modules="numpy", cse=True)
+
+    def value(self, values: Values) -> np.ndarray:
+        """Evaluates the formula for the `values`."""
+        args = self._arguments(values)
+        return np.broadcast_to(self._value(*args), np.broadcast_shapes(*(np.shape(a) for a in args)))
+
+    def partials(self, values: Values) -> list[np.ndarray]:
+        """Evaluates each partial derivation for the `values`, in the order of `self.measurands`."""
+        args = self._arguments(values)
+        shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+        return [np.broadcast_to(partial, shape) for partial in self._partials(*args)]
+        # ↑ Constant derivations evaluate to scalars, so they must be broadcast to match the others.
+
+    def uncertainty(self, values: Values, uncertainties: Values) -> np.ndarray:
+        """Evaluates the gaussian uncertainty of the formula for the `values`
+        with the `uncertainties` of `self.measurands`."""
+        uncertainties = self._uncertainties(uncertainties)
+        total = 0
+        for partial, uncertainty in zip(self.partials(values), uncertainties):
+            total = total + (partial * uncertainty) ** 2
+            # ↑ Accumulate instead of stacking all terms, so only one additional array is held at a time.
+        return np.sqrt(total)
+
+    def jacobian(self, values: Values) -> np.ndarray:
+        """Evaluates the partial derivations for the `values` and stacks them along the last axis,
+        in the order of `self.measurands`. For values of shape `(rows,)` the result has the shape `(rows, n)`."""
+        args = self._arguments(values)
+        shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+        partials = [np.broadcast_to(partial, shape) for partial in self._partials(*args)]
+        return np.stack(partials, axis=-1) if len(partials) != 0 else np.empty(shape + (0,))
+
+    def correlated_uncertainty(self, values: Values, covariance: ArrayLike) -> np.ndarray:
+        """Evaluates the uncertainty of the formula for inputs that are correlated, as `sqrt(J Σ Jᵀ)`.
+
+        `covariance` is the covariance matrix `Σ` of `self.measurands`, in their order. It is either a single matrix
+        of shape `(n, n)` that applies to all values, or one matrix per row of shape `(rows, n, n)`.
+        See `covariance_matrix()` to build it from uncertainties and correlations.
+
+        The product is computed numerically for each row, which scales far better with the count of inputs than
+        expanding the quadratic amount of covariance terms symbolically.
+        """
+        jacobian = self.jacobian(values)
+        covariance = np.asarray(covariance, dtype=float)
+        weighted = np.matmul(jacobian[..., np.newaxis, :], covariance)[..., 0, :]
+        # ↑ `J Σ` for each row, computed by BLAS.
+        return np.sqrt(np.einsum("...i,...i->...", weighted, jacobian))
+
+    def evaluate(self, values: Values, uncertainties: Values) -> tuple[np.ndarray, np.ndarray]:
+        """Evaluates the formula and its gaussian uncertainty. See `value()` and `uncertainty()`."""
+        return self.value(values), self.uncertainty(values, uncertainties)
+
+    def _arguments(self, values: Values) -> list[np.ndarray]:
+        return [np.asarray(_lookup(values, symbol, use_constants=True), dtype=float) for symbol in self.symbols]
+
+    def _uncertainties(self, uncertainties: Values) -> list[np.ndarray]:
+        return [np.asarray(_lookup(uncertainties, symbol), dtype=float) for symbol in self.measurands]
+
+
+class CompiledFormulaSet:
+    """Multiple formulas over the same symbols and their partial derivations, compiled into NumPy-vectorized functions.
+    Evaluates all formulas, their uncertainties and the covariances between them for whole arrays of measurements.
+
+    The whole Jacobian (each formula derived by each measurand) is compiled into a single function,
+    so subexpressions shared across formulas are evaluated only once.
+
+    Prefer `compile_formulas()` over the constructor, as compiling is expensive and its results are cached.
+    """
+
+    def __init__(self, formulas: Tuple, partials: Mapping[Symbol, Tuple]):
+        self.formulas = formulas
+        self.measurands = tuple(partials)
+        """The symbols with an uncertainty, in the order of the `partials`."""
+        self.symbols = tuple(sorted(
+            formulas.free_symbols.union(self.measurands, *(p.free_symbols for p in partials.values())),
+            key=lambda sym: sym.name
+        ))
+        """All symbols that are required as input."""
+
+        self._values = lambdify(self.symbols, list(formulas), modules="numpy", cse=True)
+        self._jacobian = lambdify(
+            self.symbols,
+            [[partials[symbol][index] for symbol in self.measurands] for index in range(len(formulas))],
+            modules="numpy", cse=True
+        )
+
+    def values(self, values: Values) -> np.ndarray:
+        """Evaluates all formulas for the `values` and stacks them along the last axis.
+        For values of shape `(rows,)` the result has the shape `(rows, m)` for `m` formulas."""
+        args = self._arguments(values)
+        shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+        return np.stack([np.broadcast_to(value, shape) for value in self._values(*args)], axis=-1)
+
+    def jacobian(self, values: Values) -> np.ndarray:
+        """Evaluates the Jacobian for the `values`, with one row per formula and one column per measurand.
+        For values of shape `(rows,)` the result has the shape `(rows, m, n)`."""
+        args = self._arguments(values)
+        shape = np.broadcast_shapes(*(np.shape(a) for a in args))
+        rows = [
+            np.stack([np.broadcast_to(partial, shape) for partial in row], axis=-1)
+            if len(row) != 0 else np.empty(shape + (0,))
+            for row in self._jacobian(*args)
+        ]
+        return np.stack(rows, axis=-2)
+
+    def covariance(self, values: Values, covariance: ArrayLike) -> np.ndarray:
+        """Evaluates the covariance matrix of the formulas as `J Σ Jᵀ`, of shape `(m, m)` or `(rows, m, m)`.
+        Its diagonal holds the squared uncertainty of each formula, the rest the covariances between them.
+
+        `covariance` is the covariance matrix `Σ` of `self.measurands`, see `CompiledFormula.correlated_uncertainty()`.
+        """
+        jacobian = self.jacobian(values)
+        covariance = np.asarray(covariance, dtype=float)
+        return np.matmul(np.matmul(jacobian, covariance), np.swapaxes(jacobian, -1, -2))
+
+    def uncertainties(self, values: Values, uncertainties: Values) -> np.ndarray:
+        """Evaluates the gaussian uncertainty of each formula for independent inputs with the `uncertainties`
+        of `self.measurands`. The result has the same shape as `values()`."""
+        jacobian = self.jacobian(values)
+        uncertainties = np.stack(np.broadcast_arrays(*self._uncertainties(uncertainties)), axis=-1)
+        return np.sqrt(np.sum((jacobian * uncertainties[..., np.newaxis, :]) ** 2, axis=-1))
+
+    def evaluate(self, values: Values, uncertainties: Values) -> tuple[np.ndarray, np.ndarray]:
+        """Evaluates the formulas and the covariance matrix between them for independent inputs
+        with the `uncertainties` of `self.measurands`. See `values()` and `covariance()`."""
+        uncertainties = self._uncertainties(uncertainties)
+        if len(uncertainties) != 0:
+            uncertainties = np.stack(np.broadcast_arrays(*uncertainties), axis=-1)
+        else:
+            uncertainties = np.empty(0)
+        return self.values(values), self.covariance(values, covariance_matrix(uncertainties))
+
+    _arguments = CompiledFormula._arguments
+    _uncertainties = CompiledFormula._uncertainties
+
+
+def covariance_matrix(uncertainties: ArrayLike, correlations: Optional[ArrayLike] = None) -> np.ndarray:
+    """Builds the covariance matrix from the `uncertainties` of `n` inputs and their `correlations`,
+    as `Σ = D R D` with `D` being the diagonal matrix of the uncertainties.
+
+    `uncertainties` has the shape `(n,)` or `(rows, n)`, `correlations` the shape `(n, n)` or `(rows, n, n)`.
+    Without `correlations`, the inputs are independent and the result is diagonal.
+    """
+    uncertainties = np.asarray(uncertainties, dtype=float)
+    if correlations is None:
+        correlations = np.eye(uncertainties.shape[-1])
+    correlations = np.asarray(correlations, dtype=float)
+    return uncertainties[..., :, np.newaxis] * correlations * uncertainties[..., np.newaxis, :]
+
+
+def _lookup(values: Values, symbol: Symbol, use_constants: bool = False) -> ArrayLike:
+    """Returns the value for the `symbol`, falling back to its name and then to a known constant."""
+    if symbol in values:
+        return values[symbol]
+    if symbol.name in values:
+        return values[symbol.name]
+    if use_constants and symbol.name in CONSTANTS:
+        return CONSTANTS[symbol.name]
+    raise KeyError(f"There is no value for the symbol `{symbol.name}`.")
+
+
+@lru_cache(maxsize=32)
+def compile_formula(formula: Expr, partials: tuple[tuple[Symbol, Expr], ...]) -> CompiledFormula:
+    """Returns the `CompiledFormula` for the `formula` and its `partials`, which are passed as items
+    so they can be used as cache key. Use it like `compile_formula(formula, tuple(partials.items()))`."""
+    return CompiledFormula(formula, dict(partials))
+
+
+@lru_cache(maxsize=32)
+def compile_formulas(formulas: Tuple, partials: tuple[tuple[Symbol, Tuple], ...]) -> CompiledFormulaSet:
+    """Returns the `CompiledFormulaSet` for the `formulas` and their `partials`, see `compile_formula()`."""
+    return CompiledFormulaSet(formulas, dict(partials))
+
+
+def evaluate_cards(compiled: CompiledFormula, values: Mapping[Symbol, Optional[float]],
+                   uncertainties: Mapping[Symbol, Optional[float]]) -> Optional[tuple[float, float]]:
+    """Evaluates the `compiled` formula for single values, as entered in the symbol cards.
+    Missing uncertainties count as zero. Returns `None` if any required value is missing."""
+    values = {symbol: value for symbol, value in values.items() if value is not None}
+    uncertainties = {symbol: uncertainties.get(symbol) or 0 for symbol in compiled.measurands}
+    try:
+        value, uncertainty = compiled.evaluate(values, uncertainties)
+    except KeyError:
+        return None
+    return float(value), float(uncertainty)
+
+
+def evaluate_cards_set(compiled: CompiledFormulaSet, values: Mapping[Symbol, Optional[float]],
+                       uncertainties: Mapping[Symbol, Optional[float]]) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """Like `evaluate_cards()`, but for multiple formulas.
+    Returns the value of each formula and the covariance matrix between them."""
+    values = {symbol: value for symbol, value in values.items() if value is not None}
+    uncertainties = {symbol: uncertainties.get(symbol) or 0 for symbol in compiled.measurands}
+    try:
+        return compiled.evaluate(values, uncertainties)
+    except KeyError:
+        return None
@@ -0,0 +1,140 @@
+"""This module contains the Monte Carlo propagation of uncertainties.
+
+As opposed to the gaussian uncertainty, which is a first-order linear approximation,
+this samples all inputs from their distribution and evaluates the formula for each sample,
+so it also holds for strongly nonlinear formulas.
+
+The samples are processed in chunks and only summarized per chunk, so the memory stays bounded by the `chunk_size`
+regardless of the total count of samples. The summaries of all chunks are then merged into the final result.
+"""
+import math
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+from sympy import Symbol, Expr
+
+from derivix.evaluation.compiled import compile_formula
+from derivix.utils.processes import get_process_executor
+
+if TYPE_CHECKING:
+    from derivix.deriver import Formula
+
+
+@dataclass
+class MonteCarloResult:
+    mean: float
+    std: float
+    percentiles: dict[float, float]
+    """The percentiles of the result, keyed by the requested percentile (in [0; 100])."""
+    samples: int
+    """The count of samples the result is based on."""
+    invalid: int
+    """The count of samples for which the formula did not evaluate to a finite number. These are excluded."""
+
+
+@dataclass
+class _ChunkSummary:
+    """The summary of a chunk of samples, that can be merged with the summaries of other chunks."""
+    count: int
+    mean: float
+    m2: float
+    """The sum of squared deviations from the mean."""
+    subsample: np.ndarray
+    """A random subsample of the chunk, used to estimate the percentiles."""
+    invalid: int
+
+    def merge(self, other: "_ChunkSummary") -> "_ChunkSummary":
+        """Merges the summaries with the parallel algorithm by Chan et al."""
+        count = self.count + other.count
+        if count == 0:
+            return _ChunkSummary(0, 0.0, 0.0, self.subsample, self.invalid + other.invalid)
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.count / count
+        m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        return _ChunkSummary(
+            count, mean, m2,
+            np.concatenate((self.subsample, other.subsample)),
+            self.invalid + other.invalid
+        )
+
+
+def monte_carlo(formula: "Formula", values: Mapping[Symbol, float], uncertainties: Mapping[Symbol, float],
+                samples: int = 1_000_000, chunk_size: int = 1_000_000,
+                percentiles: Sequence[float] = (2.5, 50, 97.5), subsample_size: int = 100_000,
+                processes: Optional[int] = None, seed: Optional[int] = None) -> MonteCarloResult:
+    """Propagates the uncertainties through the `formula` by sampling.
+
+    Each symbol with an uncertainty will be sampled from a normal distribution with its value as mean and its
+    uncertainty as standard deviation. All other symbols keep their value.
+
+    :param samples:
+        The total count of samples.
+    :param chunk_size:
+        The count of samples that will be evaluated at once. Bounds the memory in use.
+    :param percentiles:
+        The percentiles (in [0; 100]) to report.
+    :param subsample_size:
+        The percentiles are estimated from a random subsample of about this size,
+        as determining them exactly would require keeping all samples.
+    :param processes:
+        If greater than 1, the chunks will be evaluated in parallel in that many processes.
+    :param seed:
+        The seed for the random samples. The result for a seed does not depend on the count of `processes`.
+    """
+    chunk_sizes = [chunk_size] * (samples // chunk_size)
+    if samples % chunk_size != 0:
+        chunk_sizes.append(samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    # ↑ Each chunk gets its own independent stream, so the samples do not depend on which process draws them.
+    subsample_share = min(1.0, subsample_size / samples) if samples != 0 else 1.0
+
+    values = {symbol: float(value) for symbol, value in values.items()}
+    uncertainties = {symbol: float(u) for symbol, u in uncertainties.items() if u is not None and u != 0}
+    jobs = [
+        (formula.formula, values, uncertainties, size, chunk_seed, math.ceil(size * subsample_share))
+        for size, chunk_seed in zip(chunk_sizes, seeds)
+    ]
+
+    if processes is not None and processes > 1 and len(jobs) > 1:
+        summaries = get_process_executor(processes).map(_summarize_chunk, *zip(*jobs))
+    else:
+        summaries = (_summarize_chunk(*job) for job in jobs)
+
+    total = _ChunkSummary(0, 0.0, 0.0, np.empty(0), 0)
+    for summary in summaries:
+        total = total.merge(summary)
+
+    std = math.sqrt(total.m2 / (total.count - 1)) if total.count > 1 else math.nan
+    if total.subsample.size != 0:
+        estimates = np.percentile(total.subsample, percentiles)
+    else:
+        estimates = [math.nan] * len(percentiles)
+    return MonteCarloResult(
+        mean=total.mean if total.count != 0 else math.nan,
+        std=std,
+        percentiles={p: float(e) for p, e in zip(percentiles, estimates)},
+        samples=total.count,
+        invalid=total.invalid,
+    )
+
+
+def _summarize_chunk(formula: Expr, values: Mapping[Symbol, float], uncertainties: Mapping[Symbol, float],
+                     size: int, seed: np.random.SeedSequence, subsample_size: int) -> _ChunkSummary:
+    """Samples and evaluates a single chunk. Is run in the worker processes, which compile the formula once each."""
+    rng = np.random.default_rng(seed)
+    compiled = compile_formula(formula, ())
+    inputs = dict(values)
+    for symbol, uncertainty in uncertainties.items():
+        inputs[symbol] = rng.normal(values[symbol], uncertainty, size)
+
+    result = np.broadcast_to(compiled.value(inputs), (size,))
+    # ↑ Without any uncertainty, the result is a scalar.
+    finite = result[np.isfinite(result)]
+    invalid = size - finite.size
+    if finite.size == 0:
+        return _ChunkSummary(0, 0.0, 0.0, np.empty(0), invalid)
+    mean = float(finite.mean())
+    m2 = float(((finite - mean) ** 2).sum())
+    return _ChunkSummary(finite.size, mean, m2, finite[:subsample_size].copy(), invalid)
+    # ↑ The samples are independent, so the first ones already are a random subsample.
@@ -1,30 +1,45 @@
 import logging
 import os
+from dataclasses import replace
+from itertools import combinations
 from multiprocessing import Pool
 from pathlib import Path
 from threading import Thread
-from typing import Optional, Iterable, Callable
+from typing import Optional, Iterable, Callable, TYPE_CHECKING
 
-import sympy.core.symbol
 from PySide6.QtCore import QThreadPool, QRunnable, Signal, QObject, QTimer, QMetaObject
-from PySide6.QtGui import Qt, QIcon
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QLineEdit, QGridLayout, QPushButton, QLabel
-from sympy import Mul
-from sympy.core import symbol
-from sympy.parsing.latex import parse_latex
+from PySide6.QtGui import Qt, QIcon, QAction, QKeySequence
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QLineEdit, QGridLayout, QPushButton, QLabel, \
+    QVBoxLayout, QCheckBox, QFileDialog, QTabWidget
 
-from derivix.deriver import latex_to_svg, Formula, derive_by_symbols, as_gaussian_uncertainty
 from derivix.gui_elements.abstracts import WidgetControl
 from derivix.gui_elements.cards import CardData
 from derivix.gui_elements.formula_display import FormulaDisplay
+from derivix.gui_elements.formula_list import FormulaListView
+from derivix.gui_elements.measurement_table import MeasurementTable
 from derivix.gui_elements.prefabs import LabelWithLine
 from derivix.gui_elements.transfer_widget import TransferWidget, Filter
+from derivix.rendering import RenderSettings, PREVIEW_SETTINGS
+from derivix.rendering.pool import RenderPool, RenderTicket, RenderCancelled, RenderError
 from data import ToolIcons, OtherImages
 from derivix.utils import MutableBool
-from derivix.utils.env import TEMP_PATH
+from derivix.utils.env import DERIVE_PROCESSES
 from derivix.utils.math_util import CONSTANTS
+from derivix.utils.number_formatting import number_to_scientific
+from derivix.utils.startup import start_preload
+from derivix.utils.tracing import traced
 from derivix.utils.workers import ExceptionWorkerSignals, ExceptionWorker, emit_exception, raise_exc
 
+if TYPE_CHECKING:
+    import sympy
+    from derivix.deriver import Formula
+    from derivix.evaluation.compiled import CompiledFormula, CompiledFormulaSet
+    from derivix.evaluation.monte_carlo import MonteCarloResult
+    from derivix.project import Project, DerivationState
+    import numpy as np
+# ↑ sympy, matplotlib and numpy take seconds to import, so they are only imported where they are used.
+# Thus, the window shows up before they are loaded. See `derivix.utils.startup` for how they are preloaded.
+
 
 class MainWindow(QMainWindow, WidgetControl):
     def __init__(self):
@@ -45,10 +60,28 @@ class MainWindow(QMainWindow, WidgetControl):
         self.derive_button = QPushButton()
         self.input_formula = FormulaDisplay(show_copy=False)
         self.adv_formula = FormulaDisplay()
+        self.definitions = QWidget()
+        self.definition_displays: list[FormulaDisplay] = list()
+        self.partials = FormulaListView()
+        self.result = QLabel()
+        self.monte_carlo_result = QLabel()
+        self.monte_carlo_check = QCheckBox()
 
         self.symbol_manager = TransferWidget()
+        self.table = MeasurementTable()
+        self.symbol_tabs = QTabWidget()
+
+        self.open_action = QAction()
+        self.save_action = QAction()
+        self.export_action = QAction()
 
     def init_positions(self):
+        file_menu = self.menuBar().addMenu("File")
+        file_menu.addAction(self.open_action)
+        file_menu.addAction(self.save_action)
+        file_menu.addSeparator()
+        file_menu.addAction(self.export_action)
+
         layout = self.layout_
         layout.setAlignment(Qt.AlignmentFlag.AlignTop)
 
@@ -66,110 +99,527 @@ class MainWindow(QMainWindow, WidgetControl):
             "<h3>Symbols</h3>", pixmap=ToolIcons.var_x.get_pixmap()),
             layout.rowCount(), 1, 1, -1
         )
-        layout.addWidget(self.symbol_manager, layout.rowCount(), 1, 1, -1)
+        self.symbol_tabs.addTab(self.symbol_manager, "Cards")
+        self.symbol_tabs.addTab(self.table, "Table")
+        layout.addWidget(self.symbol_tabs, layout.rowCount(), 1, 1, -1)
 
         layout.addWidget(LabelWithLine(
             "<h3>Error Formula</h3>", pixmap=ToolIcons.var_delta_c.get_pixmap()),
             layout.rowCount(), 1, 1, -1
         )
         layout.addWidget(self.adv_formula, layout.rowCount(), 1, 1, -1)
+        self.definitions.setLayout(QVBoxLayout())
+        self.definitions.layout().setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.definitions, layout.rowCount(), 1, 1, -1)
+        layout.addWidget(self.result, layout.rowCount(), 1, 1, 2)
+        layout.addWidget(self.monte_carlo_check, layout.rowCount() - 1, 3)
+        layout.addWidget(self.monte_carlo_result, layout.rowCount(), 1, 1, -1)
 
         layout.addWidget(LabelWithLine(
             "<h3>Partial Derivations</h3>", pixmap=ToolIcons.var_delta_v.get_pixmap()),
             layout.rowCount(), 1, 1, -1
         )
+        layout.addWidget(self.partials, layout.rowCount(), 1, 1, -1)
 
     def init_style(self):
         self.setWindowTitle("derivix")
         self.setWindowIcon(QIcon(OtherImages.app_icon.get_path_string()))
+        self.partials.setMinimumHeight(240)
 
     def init_values(self):
         self.formula_input.setPlaceholderText("Enter your formula")
         self.derive_button.setText("Derive")
+        self.open_action.setText("Open Project...")
+        self.open_action.setShortcut(QKeySequence.StandardKey.Open)
+        self.save_action.setText("Save Project...")
+        self.save_action.setShortcut(QKeySequence.StandardKey.Save)
+        self.export_action.setText("Export Code...")
+        self.export_action.setToolTip(
+            "Export the formula and its uncertainty as Python or C code, which does not require derivix or sympy."
+        )
+        self.monte_carlo_check.setText("Monte Carlo")
+        self.monte_carlo_check.setToolTip(
+            "Additionally propagate the uncertainties by sampling, which also holds for strongly nonlinear formulas."
+        )
 
     def init_control(self):
         self.derive_button.clicked.connect(self.gen_adv_formula)
+        self.open_action.triggered.connect(self.open_project)
+        self.save_action.triggered.connect(self.save_project)
+        self.export_action.triggered.connect(self.export_code)
+        self.partials.model().render_requested.connect(self.render_partials)
 
         self.thread_pool = QThreadPool()
-        self.worker: Optional[ImageWorker] = None
+        self.thread_pool.setMaxThreadCount(max(4, self.thread_pool.maxThreadCount()))
+        # ↑ Most workers just wait for a render process, so the partial derivations can render while deriving
+        # continues, even on a single core.
+        self.render_pool = RenderPool()
+        self.formula: Optional["Formula"] = None
+        self.derivation: Optional["DerivationState"] = None
+        # ↑ The derivation shown in the window, which is stored in a project.
+        self.worker: Optional[FormulaWorker] = None
+        self.preview_worker: Optional[ImageWorker] = None
+        self.adv_worker: Optional[ImageWorker] = None
+        self.derive_worker: Optional[DeriveWorker] = None
+        self.partial_workers: list[ImageWorker] = list()
+        self.compiled: "Optional[CompiledFormula | CompiledFormulaSet]" = None
+        self.table_worker: Optional[TableWorker] = None
+        self.table_timer = QTimer()
+        self.table_timer.setInterval(100)
+        self.table_timer.setSingleShot(True)
+        # ↑ Evaluate the table once after a burst of edits, instead of once per edit.
+        self.table_timer.timeout.connect(self.evaluate_table)
+        self.table.model.inputs_changed.connect(self.table_timer.start)
+        self.result_timer = QTimer()
+        self.result_timer.setInterval(100)
+        self.result_timer.setSingleShot(True)
+        # ↑ Like the table, evaluate the result once after typing a number instead of once per keystroke.
+        self.result_timer.timeout.connect(self.update_result)
+        for container in self.symbol_manager.containers.values():
+            container.values_edited.connect(self.result_timer.start)
+        self.monte_carlo_worker: Optional[MonteCarloWorker] = None
         self.image_timer = QTimer()
         self.image_timer.setInterval(1000)
         self.image_timer.setSingleShot(True)
+        self.preview_timer = QTimer()
+        self.preview_timer.setInterval(20)
+        self.preview_timer.setSingleShot(True)
+        # ↑ The preview renders without TeX, so it only needs to be debounced against very fast typing.
 
         def queue_render():
             self.clear_base_formula()
+            if self.worker is not None:
+                self.worker.terminate()
+                self.worker = None
+                # ↑ The input changed, so a render in progress is outdated and would only take CPU from the next one.
             if self.formula_input.text().strip() == "":
                 self.input_formula.standby_mode()
                 self.image_timer.stop()
+                self.preview_timer.stop()
             else:
                 logging.debug(f"Queueing render")
-                self.input_formula.loading_mode()
-                # ↑ Even if a render did not start already, start loading mode as the display is outdated.
-                # Only when a render finishes, it will return to display mode.
+                if self.input_formula.mode != "p":
+                    self.input_formula.loading_mode()
+                    # ↑ Even if a render did not start already, start loading mode as the display is outdated.
+                    # Only when a render finishes, it will return to display mode.
+                    # An outdated preview is kept however, as it will be replaced by the next preview shortly.
+                self.preview_timer.start()
                 self.image_timer.start()
 
+        def start_preview():
+            if self.preview_worker is not None:
+                self.preview_worker.terminate()
+
+            latex = self.formula_input.text()
+            worker = ImageWorker([latex], settings=PREVIEW_SETTINGS, cached=False)
+            # ↑ A preview is rendered on each keystroke and quickly, so storing it would only fill the cache.
+            self.preview_worker = worker
+
+            def fail_preview(*_, w=worker):
+                if w is self.preview_worker and self.input_formula.mode in ("l", "p"):
+                    self.input_formula.loading_mode()
+                    # ↑ Mathtext only supports a subset of LaTeX, so a failed preview just waits for the actual render.
+
+            worker.signals.finished.connect(lambda svgs, *, l=latex: push_preview(svgs[0], l))
+            worker.signals.error.connect(fail_preview)
+            self.thread_pool.start(worker)
+
+        def push_preview(svg: bytes, latex: str):
+            if self.input_formula.mode in ("l", "p") and latex == self.formula_input.text():
+                # ↑ The actual render might already be displayed, which must not be replaced by a preview.
+                self.input_formula.preview_mode(svg, latex)
+
         def start_render():
             logging.debug("Starting render")
             if self.worker is not None:
                 self.worker.terminate()
+                # ↑ Kills the render of the superseded input, even if TeX is still running.
 
-            latex = self.formula_input.text()
-            self.worker = ImageWorker([latex])
+            self.worker = FormulaWorker(self.formula_input.text(), self.render_pool)
 
-            self.worker.signals.finished.connect(lambda svgs, *, l=latex: push_formula(svgs[0], l))
+            self.worker.signals.finished.connect(self.push_base_formula)
             self.worker.signals.error.connect(self.input_formula.error_mode)
             self.thread_pool.start(self.worker)
 
-        def push_formula(svg_file: Path, latex: str):
-            formula = Formula(svg_file=svg_file, formula=parse_latex(latex), latex=latex)
-            self.push_base_formula(formula)
-
         self.image_timer.timeout.connect(start_render)
+        self.preview_timer.timeout.connect(start_preview)
         self.formula_input.textChanged.connect(queue_render)
 
     def clear_base_formula(self):
         for container in self.symbol_manager.containers.values():
             container.remove_all()
 
-    def push_base_formula(self, formula: Formula):
+    def push_base_formula(self, formula: "Formula", cards: Optional[list[CardData]] = None):
         self.formula = formula
-        self.input_formula.display_mode(formula.svg_file, formula.latex)
-        cards = create_cards_from_symbols(formula.formula.free_symbols)
+        self.derivation = None
+        self.compiled = None
+        if self.derive_worker is not None:
+            self.derive_worker.terminate()
+            self.derive_worker = None
+            # ↑ The derivation of the previous formula must not be shown for this one.
+        self.input_formula.display_mode(formula.svg, formula.latex)
+        self.table.model.set_symbols(sorted(
+            (symbol for symbol in formula.formula.free_symbols if symbol.name not in CONSTANTS),
+            key=lambda sym: sym.name
+        ))
+        if cards is None:
+            cards = create_cards_from_symbols(formula.formula.free_symbols)
         for card in cards:
             self.symbol_manager.containers[card.filter].add_card(card)
 
     def gen_adv_formula(self):
+        if self.adv_worker is not None:
+            self.adv_worker.terminate()
+            self.adv_worker = None
+        if self.derive_worker is not None:
+            self.derive_worker.terminate()
         self.adv_formula.loading_mode()
+        self.derivation = None
+        self.compiled = None
+        self.clear_definitions()
+        self.clear_partials()
+        self.result.setText("")
+        self.monte_carlo_result.setText("")
+        self.monte_carlo_worker = None
 
         cards = list(self.symbol_manager.containers[Filter.Include].cards)
         symbols = [c.symbol for c in cards]
 
-        worker = DeriveWorker(self.formula.formula, symbols)
+        worker = DeriveWorker(self.formula, symbols)
+        self.derive_worker = worker
         worker.signals.error.connect(raise_exc)
 
+        def push_partials(partials: list[str], *, w=worker):
+            if w is self.derive_worker:
+                self.partials.model().append(partials)
+                # ↑ Each partial derivation is listed as soon as it is computed, the error formula once all are done.
+
         def finish(*, w=worker):
-            derived_formulas = [sympy.latex(f) for f in w.derived_formulas]
-            self.render_adv_formula(w.gaussian_formula, derived_formulas)
+            if w is not self.derive_worker:
+                return
+                # ↑ A terminated worker may still deliver signals that were queued before it was superseded.
+            self.derive_worker = None
+            self.render_adv_formula(w.gaussian_latex, w.definitions_latex, [symbol.name for symbol in w.symbols])
+            self.show_result(w.compiled)
+
+        worker.signals.partial.connect(push_partials)
+        worker.signals.finished.connect(finish)
+
+        self.thread_pool.start(worker)
+
+    def render_adv_formula(self, gaussian_formulas: list[str], definitions: list[str], symbols: list[str]):
+        """Renders the formulas produced by `gen_adv_formula` for the derivation by the `symbols`."""
+        from derivix.project import DerivationState
+
+        if self.adv_worker is not None:
+            self.adv_worker.terminate()
+        worker = ImageWorker([*gaussian_formulas, *definitions], self.render_pool)
+        self.adv_worker = worker
+
+        def finish(svgs: tuple[bytes], *, w=worker):
+            if w is not self.adv_worker:
+                return
+                # ↑ A superseded render must not replace the display or the derivation stored in a project.
+            self.adv_worker = None
+            self.show_adv_formula(gaussian_formulas, definitions, list(svgs))
+            self.derivation = DerivationState(symbols, gaussian_formulas, definitions, list(svgs), list())
+
+        def fail(err: Exception, *, w=worker):
+            if w is self.adv_worker:
+                self.adv_worker = None
+                self.adv_formula.error_mode(err)
 
         worker.signals.finished.connect(finish)
+        worker.signals.error.connect(fail)
 
         self.thread_pool.start(worker)
 
-    def render_adv_formula(self, gaussian_formula: str, derived_formulas: Iterable[str]):
-        """Renders the formulas produced by `gen_adv_formula`"""
-        worker = ImageWorker([gaussian_formula])
+    def show_adv_formula(self, gaussian_formulas: list[str], definitions: list[str], svgs: list[bytes]):
+        """Shows the rendered uncertainty formulas and auxiliary quantities, with `svgs` holding the renders of both.
+        The first uncertainty is shown in the main display, the ones of further outputs below it."""
+        secondary = [*gaussian_formulas[1:], *definitions]
+        self.adv_formula.display_mode(svgs[0], gaussian_formulas[0])
+        self.clear_definitions()
+        for svg, definition in zip(svgs[1:], secondary):
+            display = FormulaDisplay()
+            display.display_mode(svg, definition)
+            self.definitions.layout().addWidget(display)
+            self.definition_displays.append(display)
+
+    def render_partials(self, rows: list[int]):
+        """Renders the partial derivations in the `rows`, as requested by the list once they are scrolled into view."""
+        model = self.partials.model()
+        worker = ImageWorker([model.formulas[row] for row in rows], self.render_pool)
+        self.partial_workers.append(worker)
+
+        def finish(svgs: tuple[bytes], *, w=worker):
+            if w not in self.partial_workers:
+                return
+                # ↑ The partial derivations were cleared after the render finished, but before this was called.
+            self.partial_workers.remove(w)
+            model.set_svgs(rows, list(svgs))
+
+        def fail(err: Exception, *, w=worker):
+            if w not in self.partial_workers:
+                return
+            self.partial_workers.remove(w)
+            logging.error(err)
+            if not isinstance(err, RenderError):
+                model.fail(rows, str(err))
+                # ↑ Otherwise, the rows would stay pending and never be requested again.
+                return
+            rendered = [index for index, svg in enumerate(err.svgs) if svg is not None]
+            model.set_svgs([rows[index] for index in rendered], [err.svgs[index] for index in rendered])
+            for index, error in err.errors.items():
+                model.fail([rows[index]], str(error))
+
+        worker.signals.finished.connect(finish)
+        worker.signals.error.connect(fail)
+        self.thread_pool.start(worker)
+
+    def show_result(self, compiled: "CompiledFormula | CompiledFormulaSet"):
+        """Evaluates the formula with the values of the symbol cards and the measurement table
+        with the `compiled` formula of a finished derivation and shows the results."""
+        from derivix.evaluation.compiled import CompiledFormulaSet
+
+        self.compiled = compiled
+        if isinstance(compiled, CompiledFormulaSet):
+            self.table.model.set_outputs([f"f{index + 1}" for index in range(len(compiled.formulas))])
+        else:
+            self.table.model.set_outputs(["f"])
+        self.evaluate_table()
+        self.update_result()
+
+    def update_result(self):
+        """Evaluates the formula with the values of the symbol cards and shows the result,
+        if there is a value for every symbol. Called again whenever a value or uncertainty is edited."""
+        from derivix.evaluation.compiled import CompiledFormulaSet, evaluate_cards
+
+        compiled = self.compiled
+        if compiled is None:
+            return
+            # ↑ Without a derivation, or while deriving, there is no uncertainty to evaluate yet.
+        cards = [card for container in self.symbol_manager.containers.values() for card in container.cards]
+        values = {card.symbol: card.primary.v for card in cards}
+        uncertainties = {card.symbol: card.secondary.v for card in cards if card.filter == Filter.Include}
+        if isinstance(compiled, CompiledFormulaSet):
+            self.show_results(compiled, values, uncertainties)
+            return
+        result = evaluate_cards(compiled, values, uncertainties)
+        if result is None:
+            self.result.setText("Enter a value for each symbol to calculate the result.")
+            self.monte_carlo_worker = None
+            self.monte_carlo_result.setText("")
+        else:
+            value, uncertainty = result
+            self.result.setText(f"f = {number_to_scientific(value)} ± {number_to_scientific(uncertainty)}")
+            if self.monte_carlo_check.isChecked():
+                values = {symbol: value for symbol, value in values.items() if value is not None}
+                # ↑ Symbols without value are known constants, which are resolved by the evaluation itself.
+                self.start_monte_carlo(values, uncertainties)
+
+    def show_results(self, compiled: "CompiledFormulaSet", values: dict["sympy.Symbol", Optional[float]],
+                     uncertainties: dict["sympy.Symbol", Optional[float]]):
+        """Shows the result of each output of multiple formulas and the correlations between them.
+        Monte Carlo is only supported for a single formula, so it is skipped."""
+        import numpy as np
+        from derivix.evaluation.compiled import evaluate_cards_set
+
+        result = evaluate_cards_set(compiled, values, uncertainties)
+        if result is None:
+            self.result.setText("Enter a value for each symbol to calculate the result.")
+            return
+        values, covariance = result
+        deviations = np.sqrt(np.diagonal(covariance))
+        lines = [
+            f"f{index + 1} = {number_to_scientific(float(value))} ± {number_to_scientific(float(deviation))}"
+            for index, (value, deviation) in enumerate(zip(values, deviations))
+        ]
+        for i, j in combinations(range(len(values)), 2):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                correlation = covariance[i, j] / (deviations[i] * deviations[j])
+            lines.append(
+                f"cov(f{i + 1}, f{j + 1}) = {number_to_scientific(float(covariance[i, j]))}"
+                f" (correlation: {float(correlation):.3f})"
+            )
+        self.result.setText("\n".join(lines))
+
+    def start_monte_carlo(self, values: dict["sympy.Symbol", float], uncertainties: dict["sympy.Symbol", float]):
+        self.monte_carlo_result.setText("Sampling...")
+        worker = MonteCarloWorker(self.formula, values, uncertainties)
+        self.monte_carlo_worker = worker
         worker.signals.error.connect(raise_exc)
 
-        def finish(svg_files: tuple[Path]):
-            self.adv_formula.display_mode(svg_files[0], gaussian_formula)
+        def finish(result: "MonteCarloResult", *, w=worker):
+            if w is not self.monte_carlo_worker:
+                return
+                # ↑ The values were edited while sampling, so a newer run is pending.
+            low, high = result.percentiles[2.5], result.percentiles[97.5]
+            self.monte_carlo_result.setText(
+                f"Monte Carlo: f = {number_to_scientific(result.mean)} ± {number_to_scientific(result.std)}"
+                f" (95 % interval: {number_to_scientific(low)} to {number_to_scientific(high)})"
+            )
 
         worker.signals.finished.connect(finish)
+        self.thread_pool.start(worker)
+
+    def evaluate_table(self):
+        """Evaluates the formula for all rows of the measurement table in the background, batch by batch."""
+        if self.table_worker is not None:
+            self.table_worker.terminate()
+            self.table_worker = None
+        model = self.table.model
+        if model.inputs is None:
+            self.table.status.setText("")
+            return
+        if self.compiled is None:
+            self.table.status.setText(f"{len(model.inputs)} rows, derive the formula to evaluate them.")
+            return
+        self.table.status.setText(f"Evaluating {len(model.inputs)} rows...")
+        worker = TableWorker(self.compiled, model.symbols, model.inputs.copy())
+        # ↑ A copy, so edits while the worker runs do not mix into a batch. They restart the evaluation instead.
+        self.table_worker = worker
+        worker.signals.error.connect(raise_exc)
 
+        def push_batch(start: int, values: "np.ndarray", uncertainties: "np.ndarray", *, w=worker):
+            if w is self.table_worker:
+                model.set_results(start, values, uncertainties)
+
+        def finish(*, w=worker):
+            if w is self.table_worker:
+                self.table.status.setText(f"{len(w.inputs)} rows evaluated.")
+                self.table_worker = None
+
+        worker.signals.batch.connect(push_batch)
+        worker.signals.finished.connect(finish)
         self.thread_pool.start(worker)
 
+    def clear_definitions(self):
+        """Removes the displays of the further outputs and the auxiliary quantities used by the error formulas."""
+        for display in self.definition_displays:
+            self.definitions.layout().removeWidget(display)
+            display.deleteLater()
+        self.definition_displays.clear()
+
+    def clear_partials(self):
+        """Removes the partial derivations and cancels the renders of those still pending."""
+        for worker in self.partial_workers:
+            worker.terminate()
+        self.partial_workers.clear()
+        self.partials.clear()
+
+    def save_project(self):
+        from derivix.project import PROJECT_SUFFIX
+
+        if self.formula is None:
+            return
+        file, _ = QFileDialog.getSaveFileName(self, "Save Project", "", f"Projects (*{PROJECT_SUFFIX})")
+        if file:
+            self.write_project(Path(file).with_suffix(PROJECT_SUFFIX))
+
+    def write_project(self, file: Path):
+        """Stores the current formula, symbols and derivation with all their renders in `file`."""
+        from derivix.project import Project, SymbolState, save_project
+
+        symbols = [
+            SymbolState(card.name, bool(card.filter), card.primary.v, card.secondary.v)
+            for container in self.symbol_manager.containers.values() for card in container.cards
+        ]
+        derivation = self.derivation
+        if derivation is not None:
+            model = self.partials.model()
+            derivation = replace(derivation, partials_latex=list(model.formulas), partial_svgs=dict(model.svgs))
+        project = Project(
+            self.formula.latex, self.formula.formula, self.formula.svg, self.formula.derivations.snapshot(),
+            symbols, derivation
+        )
+        save_project(project, file)
+
+    def open_project(self):
+        from derivix.project import PROJECT_SUFFIX
+
+        file, _ = QFileDialog.getOpenFileName(self, "Open Project", "", f"Projects (*{PROJECT_SUFFIX})")
+        if file:
+            self.read_project(Path(file))
+
+    def read_project(self, file: Path):
+        """Loads the project stored in `file` in the background and restores it once loaded."""
+        worker = ProjectWorker(file)
+        worker.signals.error.connect(raise_exc)
+
+        def finish(project: "Project", compiled, *, w=worker):
+            self.restore_project(project, compiled)
+
+        worker.signals.finished.connect(finish)
+        self.thread_pool.start(worker)
+
+    def restore_project(self, project: "Project", compiled: "Optional[CompiledFormula | CompiledFormulaSet]"):
+        """Restores the window to the state stored in the `project`, without parsing, deriving or rendering."""
+        from derivix.deriver import Formula
+
+        for worker in (self.worker, self.preview_worker, self.adv_worker, self.derive_worker):
+            if worker is not None:
+                worker.terminate()
+        self.adv_worker = None
+        self.derive_worker = None
+        self.image_timer.stop()
+        self.preview_timer.stop()
+        self.formula_input.blockSignals(True)
+        self.formula_input.setText(project.latex)
+        self.formula_input.blockSignals(False)
+        # ↑ Otherwise, the input would be parsed and rendered again.
+
+        formula = Formula(project.formula, project.latex, project.svg)
+        formula.derivations.memoize(project.partials)
+        cards = list()
+        for state in project.symbols:
+            card = CardData(project.symbol(state.name), Filter(state.include))
+            card.primary.v = state.value
+            card.secondary.v = state.uncertainty
+            cards.append(card)
+        self.clear_base_formula()
+        self.push_base_formula(formula, cards)
+
+        self.clear_definitions()
+        self.clear_partials()
+        self.result.setText("")
+        self.monte_carlo_result.setText("")
+        self.monte_carlo_worker = None
+        derivation = project.derivation
+        if derivation is None:
+            self.adv_formula.standby_mode()
+            return
+        self.show_adv_formula(derivation.gaussian_latex, derivation.definitions_latex, derivation.svgs)
+        model = self.partials.model()
+        model.append(derivation.partials_latex)
+        model.set_svgs(list(derivation.partial_svgs), list(derivation.partial_svgs.values()))
+        self.derivation = derivation
+        self.show_result(compiled)
+
+    def export_code(self):
+        if self.formula is None or self.derivation is None:
+            return
+        file, selected = QFileDialog.getSaveFileName(self, "Export Code", "", ";;".join(EXPORT_FORMATS))
+        if file:
+            self.write_code(Path(file), EXPORT_FORMATS[selected])
+
+    def write_code(self, file: Path, format_: str):
+        """Exports the shown derivation to `file` in the `format_` (see `ExportWorker`) in the background."""
+        symbols = {symbol.name: symbol for symbol in self.formula.formula.free_symbols}
+        partials = self.formula.derivations.snapshot()
+        partials = {symbols[name]: partials[symbols[name]] for name in self.derivation.symbols}
+        worker = ExportWorker(self.formula, partials, file, format_)
+        worker.signals.error.connect(raise_exc)
 
+        def finish(*, w=worker):
+            logging.info(f"Exported code to {w.file}")
 
+        worker.signals.finished.connect(finish)
+        self.thread_pool.start(worker)
 
+    def closeEvent(self, event):
+        self.render_pool.close()
+        super().closeEvent(event)
 
     @property
     def layout_(self) -> QGridLayout:
@@ -178,21 +628,116 @@ class MainWindow(QMainWindow, WidgetControl):
 
 class DeriveWorkerSignals(ExceptionWorkerSignals):
     finished = Signal()
+    partial = Signal(list)
+    """Emitted for each partial derivation as soon as it is computed, with a LaTeX equation for each output."""
 
 
 class DeriveWorker(ExceptionWorker):
-    def __init__(self, formula: Mul, symbols: Iterable[symbol]):
+    """Derives the `formula` by the `symbols`.
+    Derivations from former runs on the same `formula` are reused from its `DerivationStore`.
+
+    For multiple formulas, all of them are derived in the same pass and share their auxiliary quantities,
+    `gaussian_formulas` then holds the uncertainty of each."""
+
+    def __init__(self, formula: "Formula", symbols: Iterable["sympy.Symbol"]):
         super().__init__()
         self.signals = DeriveWorkerSignals()
 
         self.formula = formula
-        self.symbols = symbols
+        self.symbols = list(symbols)
+        self._force_terminate = False
 
     @emit_exception
+    @traced()
     def run(self) -> None:
-        self.derived_formulas = derive_by_symbols(self.formula, self.symbols)
-        self.gaussian_formula = as_gaussian_uncertainty(self.derived_formulas)
-        self.signals.finished.emit()
+        from sympy import Tuple
+        from derivix.deriver import eliminate_common_subexpressions, as_gaussian_uncertainty, gaussian_to_latex, \
+            split_outputs, output_names, definitions_to_latex, partial_to_latex
+        from derivix.evaluation.compiled import compile_formula, compile_formulas
+
+        derivations = dict()
+        for symbol, derivation in self.formula.derivations.iter_derive(self.symbols, processes=DERIVE_PROCESSES):
+            if self._force_terminate:
+                return
+            derivations[symbol] = derivation
+            self.signals.partial.emit(partial_to_latex(self.formula.formula, symbol, derivation))
+        self.derived_formulas = {symbol: derivations[symbol] for symbol in self.symbols}
+        self.definitions, reduced_formulas = eliminate_common_subexpressions(self.derived_formulas)
+        self.definitions_latex = definitions_to_latex(self.definitions)
+        self.gaussian_formulas = [as_gaussian_uncertainty(reduced) for reduced in split_outputs(reduced_formulas)]
+        self.gaussian_latex = [
+            gaussian_to_latex(gaussian, name)
+            for gaussian, name in zip(self.gaussian_formulas, output_names(self.formula.formula))
+        ]
+        if isinstance(self.formula.formula, Tuple):
+            self.compiled = compile_formulas(self.formula.formula, tuple(self.derived_formulas.items()))
+        else:
+            self.compiled = compile_formula(self.formula.formula, tuple(self.derived_formulas.items()))
+        if not self._force_terminate:
+            self.signals.finished.emit()
+
+    def terminate(self):
+        """Stops the worker after the current derivation, so it will not emit any further signal."""
+        self._force_terminate = True
+
+
+class FormulaWorkerSignals(ExceptionWorkerSignals):
+    finished = Signal(object)
+
+
+class FormulaWorker(ExceptionWorker):
+    """Parses and renders the `latex` input and emits the resulting `Formula`,
+    so the parsed expression is available without ever parsing in the UI thread."""
+
+    def __init__(self, latex: str, render_pool: Optional[RenderPool] = None):
+        super().__init__()
+        self.signals = FormulaWorkerSignals()
+        self.latex = latex
+        self.render_pool = render_pool
+        self.ticket = RenderTicket()
+
+    @emit_exception
+    @traced()
+    def run(self) -> None:
+        from derivix.deriver import parse_formula, latex_to_svg, Formula
+
+        if self.ticket.cancelled:
+            return
+        expression = parse_formula(self.latex)
+        # ↑ Parse first, as an invalid formula does not need to be rendered.
+        try:
+            svg = latex_to_svg(self.latex, pool=self.render_pool, ticket=self.ticket)
+        except RenderCancelled:
+            return
+        if not self.ticket.cancelled:
+            self.signals.finished.emit(Formula(formula=expression, latex=self.latex, svg=svg))
+
+    def terminate(self):
+        """Cancels the worker, so it will not emit any signal.
+        A render in the `render_pool` is killed immediately."""
+        self.ticket.cancel()
+
+
+class MonteCarloWorkerSignals(ExceptionWorkerSignals):
+    finished = Signal(object)
+
+
+class MonteCarloWorker(ExceptionWorker):
+    def __init__(self, formula: "Formula", values: dict["sympy.Symbol", float],
+                 uncertainties: dict["sympy.Symbol", float]):
+        super().__init__()
+        self.signals = MonteCarloWorkerSignals()
+        self.formula = formula
+        self.values = values
+        self.uncertainties = uncertainties
+
+    @emit_exception
+    @traced()
+    def run(self) -> None:
+        from derivix.evaluation.monte_carlo import monte_carlo
+
+        result = monte_carlo(self.formula, self.values, self.uncertainties)
+        self.signals.finished.emit(result)
 
 
 class ImageWorkerSignals(ExceptionWorkerSignals):
@@ -200,24 +745,164 @@ class ImageWorkerSignals(ExceptionWorkerSignals):
 
 
 class ImageWorker(ExceptionWorker):
-    def __init__(self, formulas: list[str]):
+    def __init__(self, formulas: list[str], render_pool: Optional[RenderPool] = None,
+                 settings: RenderSettings = RenderSettings(), cached: bool = True):
         super().__init__()
         self.signals = ImageWorkerSignals()
         self.formulas = formulas
+        self.render_pool = render_pool
+        self.settings = settings
+        self.cached = cached
+        # ↑ Whether the renders are loaded from and stored in the `RENDER_CACHE`.
+        self.ticket = RenderTicket()
+
+    @emit_exception
+    @traced()
+    def run(self) -> None:
+        from derivix.deriver import latex_to_svgs, RENDER_CACHE
+
+        cache = RENDER_CACHE if self.cached else None
+        try:
+            svgs = latex_to_svgs(self.formulas, self.settings, cache, self.render_pool, self.ticket)
+        except RenderCancelled:
+            return
+        if not self.ticket.cancelled:
+            self.signals.finished.emit(tuple(svgs))
+
+    def terminate(self):
+        """Cancels the worker, so it will not emit any signal.
+        Renders in the `render_pool` or a batched TeX run are killed immediately."""
+        self.ticket.cancel()
+
+
+class ProjectWorkerSignals(ExceptionWorkerSignals):
+    finished = Signal(object, object)
+
+
+class ProjectWorker(ExceptionWorker):
+    """Loads the project stored in `file` and compiles its derivation, if any,
+    so restoring it in the UI thread only needs to fill in the widgets."""
+
+    def __init__(self, file: Path):
+        super().__init__()
+        self.signals = ProjectWorkerSignals()
+        self.file = file
+
+    @emit_exception
+    @traced()
+    def run(self) -> None:
+        from sympy import Tuple
+        from derivix.evaluation.compiled import compile_formula, compile_formulas
+        from derivix.project import load_project
+
+        project = load_project(self.file)
+        compiled = None
+        if project.derivation is not None:
+            symbols = [project.symbol(name) for name in project.derivation.symbols]
+            partials = tuple((symbol, project.partials[symbol]) for symbol in symbols)
+            if isinstance(project.formula, Tuple):
+                compiled = compile_formulas(project.formula, partials)
+            else:
+                compiled = compile_formula(project.formula, partials)
+        self.signals.finished.emit(project, compiled)
+
+
+class TableWorkerSignals(ExceptionWorkerSignals):
+    batch = Signal(int, object, object)
+    """Emitted with the first row of a batch and its results and their uncertainties, of shape `(rows, outputs)`."""
+    finished = Signal()
+
+
+class TableWorker(ExceptionWorker):
+    """Evaluates the `compiled` formula for each row of the `inputs` of a `MeasurementModel`,
+    whose columns hold the value and the uncertainty of each of the `symbols`.
+
+    The rows are evaluated in vectorized batches of `batch_size` rows,
+    so the results show up while the rest is evaluated and the memory for intermediate arrays stays bounded.
+    Missing uncertainties count as zero, like in the cards."""
+    batch_size = 65_536
+
+    def __init__(self, compiled: "CompiledFormula | CompiledFormulaSet", symbols: list["sympy.Symbol"],
+                 inputs: "np.ndarray"):
+        super().__init__()
+        self.signals = TableWorkerSignals()
+        self.compiled = compiled
+        self.symbols = symbols
+        self.inputs = inputs
         self._force_terminate = False
 
     @emit_exception
+    @traced()
     def run(self) -> None:
-        svg_files = [latex_to_svg(formula, TEMP_PATH) for formula in self.formulas]
-        # ↑ Could be upgraded to use multiprocessing, but right now this causes issues with matlab.
+        import numpy as np
+        from derivix.evaluation.compiled import CompiledFormulaSet
+
+        for start in range(0, len(self.inputs), self.batch_size):
+            if self._force_terminate:
+                return
+            rows = self.inputs[start:start + self.batch_size]
+            values = {symbol: rows[:, 2 * index] for index, symbol in enumerate(self.symbols)}
+            uncertainties = {symbol: np.nan_to_num(rows[:, 2 * index + 1]) for index, symbol in enumerate(self.symbols)}
+            uncertainties = {symbol: uncertainties.get(symbol, 0.0) for symbol in self.compiled.measurands}
+            with np.errstate(all="ignore"):
+                # ↑ Rows with missing or invalid values just result in NaN.
+                if isinstance(self.compiled, CompiledFormulaSet):
+                    results, covariance = self.compiled.evaluate(values, uncertainties)
+                    deviations = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+                else:
+                    results, deviations = self.compiled.evaluate(values, uncertainties)
+                    deviations = np.broadcast_to(deviations, results.shape)
+                    # ↑ Without any measurand, the uncertainty is a scalar.
+                    results, deviations = results[:, np.newaxis], deviations[:, np.newaxis]
+            self.signals.batch.emit(start, results, deviations)
         if not self._force_terminate:
-            self.signals.finished.emit(tuple(svg_files))
+            self.signals.finished.emit()
 
     def terminate(self):
+        """Stops the worker after the current batch, so it will not emit any further signal."""
         self._force_terminate = True
 
 
-def create_cards_from_symbols(symbols: set[sympy.core.symbol.Symbol]) -> list[CardData]:
+EXPORT_FORMATS = {
+    "Python Module (*.py)": "python",
+    "Python Module compiled by Numba (*.py)": "numba",
+    "C Source (*.c)": "c",
+}
+"""The formats for `ExportWorker` by the file filter they are offered under."""
+
+
+class ExportWorkerSignals(ExceptionWorkerSignals):
+    finished = Signal()
+
+
+class ExportWorker(ExceptionWorker):
+    """Generates the code to evaluate the `formula` and its uncertainty by the `partials` and writes it to `file`.
+    The `format_` is `python`, `numba` or `c`, see `derivix.evaluation.codegen`."""
+
+    def __init__(self, formula: "Formula", partials: dict["sympy.Symbol", "sympy.Expr"], file: Path, format_: str):
+        super().__init__()
+        self.signals = ExportWorkerSignals()
+        self.formula = formula
+        self.partials = partials
+        self.file = file
+        self.format = format_
+
+    @emit_exception
+    @traced()
+    def run(self) -> None:
+        from derivix.evaluation.codegen import generate_python, generate_c
+
+        if self.format == "c":
+            code = generate_c(self.formula.formula, self.partials, latex=self.formula.latex)
+        else:
+            code = generate_python(
+                self.formula.formula, self.partials, numba=self.format == "numba", latex=self.formula.latex
+            )
+        self.file.write_text(code, encoding="utf-8")
+        self.signals.finished.emit()
+
+
+def create_cards_from_symbols(symbols: set["sympy.Symbol"]) -> list[CardData]:
     cards = list()
     for symbol in symbols:
         try:
@@ -236,4 +921,8 @@ if __name__ == '__main__':
 
     win = MainWindow()
     win.show()
+    app.processEvents()
+    # ↑ Paint the window before the preload competes with it for the interpreter.
+    start_preload()
+    win.render_pool.start()
     app.exec()
@@ -1,9 +1,8 @@
 from dataclasses import dataclass, field
 from typing import Optional, Type, Union, TYPE_CHECKING
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 from PySide6.QtWidgets import QWidget, QFrame, QGridLayout, QLabel, QHBoxLayout, QBoxLayout
-from sympy import Symbol
 
 from derivix.gui_elements.abstracts import WidgetControl
 from derivix.gui_elements.linked_buttons import LinkedButton, ButtonGroup
@@ -11,12 +10,13 @@ from derivix.gui_elements.number_line_edit import NumberEntry
 from derivix.utils import SharedAttribute
 
 if TYPE_CHECKING:
+    from sympy import Symbol
     from derivix.gui_elements.transfer_widget import Filter
 
 
 @dataclass
 class CardData:
-    symbol: Symbol
+    symbol: "Symbol"
     filter: "Filter"
     linked_widget: Optional[QWidget] = field(init=False)
     container: Optional["CardContainer"] = field(init=False)
@@ -64,6 +64,9 @@ class SquareCard(CardButton):
 class CardContainer(QFrame):
     card_widget_type: Union[Type["SquareCard"], Type["InputCard"]]
 
+    values_edited = Signal()
+    """Emitted when the value or uncertainty of one of the cards is edited."""
+
     def __init__(self):
         super().__init__()
         self.cards: list[CardData] = list()
@@ -168,6 +171,11 @@ class InputCard(QFrame, WidgetControl):
 
     def init_control(self):
         self.display.setCheckable(True)
+        self.input.textEdited.connect(self.emit_values_edited)
+
+    def emit_values_edited(self):
+        if self.card.container is not None:
+            self.card.container.values_edited.emit()
 
     @property
     def layout_(self) -> QHBoxLayout:
@@ -181,6 +189,10 @@ class MeasurandCard(InputCard):
         super().init_content()
         self.second_input = NumberEntry(self.card.secondary)
 
+    def init_control(self):
+        super().init_control()
+        self.second_input.textEdited.connect(self.emit_values_edited)
+
     def init_positions(self):
         super().init_positions()
         self.layout_.addWidget(QLabel("±"))
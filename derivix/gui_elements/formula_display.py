@@ -1,5 +1,4 @@
 import logging
-from pathlib import Path
 from typing import Optional, Literal
 
 import pyperclip
@@ -9,6 +8,7 @@ from PySide6.QtWidgets import QLabel, QBoxLayout, QFrame, QPushButton, QVBoxLayo
 
 from derivix.gui_elements.abstracts import WidgetControl
 from derivix.gui_elements.animations import JumpyDots
+from derivix.gui_elements.svg_view import SvgView
 from data import ToolIcons
 
 
@@ -17,7 +17,7 @@ class FormulaDisplay(QFrame, WidgetControl):
     default_width = 240
     loading_animation_base = lambda: JumpyDots(3, 8, Qt.GlobalColor.darkGray)
     loading_animation: Optional[JumpyDots]
-    mode: Literal["s", "l", "d", "e"]
+    mode: Literal["s", "l", "p", "d", "e"]
 
     def __init__(self, show_copy: bool = True):
         super().__init__()
@@ -40,14 +40,17 @@ class FormulaDisplay(QFrame, WidgetControl):
         self.formula_widget.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.button_layout.addWidget(self.copy_button)
         self.formula_layout.addWidget(self.formula_widget)
+        self.formula_layout.addWidget(self.svg_view)
 
     def init_values(self):
         self.copy_button.setToolTip("Copy Formula to Clipboard")
+        self.svg_view.setToolTip("Ctrl + Scroll to zoom, drag to pan, double click to reset")
 
     def init_content(self):
         self.loading_animation = None
         self.copy_button = QPushButton()
         self.formula_widget = QLabel()
+        self.svg_view = SvgView()
 
     def init_style(self):
         self.setFrameShape(QFrame.Shape.Box)
@@ -75,20 +78,32 @@ class FormulaDisplay(QFrame, WidgetControl):
         self.loading_animation = self.__class__.loading_animation_base()
         self.formula_layout.addWidget(self.loading_animation)
 
-    def display_mode(self, svg_file: Path, formula: Optional[str]):
+    def preview_mode(self, svg: bytes, formula: Optional[str]):
+        """Shows a quickly rendered preview of the formula until the final render arrives via `display_mode()`.
+        Copying is not offered, as the final render might still reveal an error in the formula."""
+        self.mode = "p"
+        self.clear()
+        self.formula = formula
+        self._show_svg(svg)
+
+    def display_mode(self, svg: bytes, formula: Optional[str]):
         self.mode = "d"
         self.clear()
         self.formula = formula
         if self.show_copy:
             self.copy_button.show()
-        pix = QPixmap(svg_file)
+        self._show_svg(svg)
+
+    def _show_svg(self, svg: bytes):
         screen_width = QApplication.primaryScreen().geometry().width()
-        max_width = int(screen_width * 0.9)
-        if pix.width() > max_width:
-            pix = pix.scaledToWidth(max_width, Qt.TransformationMode.SmoothTransformation)
-        self.formula_widget.setPixmap(pix)
-        self.setFixedWidth(pix.width() + 50)
-        self.setFixedHeight(int(pix.height() * 1.1 + 30))
+        self.svg_view.max_width = int(screen_width * 0.9)
+        self.svg_view.load(svg)
+        size = self.svg_view.base_size
+        self.svg_view.setFixedSize(size)
+        self.formula_widget.hide()
+        self.svg_view.show()
+        self.setFixedWidth(size.width() + 50)
+        self.setFixedHeight(int(size.height() * 1.1 + 30))
 
     def standby_mode(self):
         self.mode = "s"
@@ -122,3 +137,6 @@ class FormulaDisplay(QFrame, WidgetControl):
             self.loading_animation.deleteLater()
             self.loading_animation = None
         self.formula_widget.setPixmap(QPixmap())
+        self.formula_widget.show()
+        self.svg_view.hide()
+        self.svg_view.clear()
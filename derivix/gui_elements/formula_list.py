@@ -0,0 +1,249 @@
+from collections import OrderedDict
+from typing import Optional
+
+import pyperclip
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QPersistentModelIndex, QByteArray, QSize, QRect, \
+    QMargins, Qt, QTimer, Signal
+from PySide6.QtGui import QPainter, QPixmap, QImage, QKeySequence, QKeyEvent, QPalette
+from PySide6.QtSvg import QSvgRenderer
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QAbstractItemView
+
+from derivix.utils.env import PIXMAP_CACHE_MAX_BYTES
+from derivix.utils.tracing import span
+
+
+class FormulaListModel(QAbstractListModel):
+    """A list of LaTeX formulas, which are rendered lazily once they are shown.
+
+    Painting a formula that has not been rendered yet requests its render via `render_requested`.
+    The requests of a single repaint are collected, so all formulas scrolled into view are rendered in one batch.
+    The renders are passed back via `set_svgs()`, or `fail()` if they failed. A failed formula is not requested again.
+
+    :cvar SvgRole:
+        The role for the rendered SVG of a formula, `None` while it is not rendered yet.
+    :cvar SizeRole:
+        The role for the natural size of the rendered SVG, `None` while it is not rendered yet.
+    :cvar ErrorRole:
+        The role for the error message of a failed render, `None` unless the render failed.
+    """
+    SvgRole = Qt.ItemDataRole.UserRole
+    SizeRole = Qt.ItemDataRole.UserRole + 1
+    ErrorRole = Qt.ItemDataRole.UserRole + 2
+
+    render_requested = Signal(list)
+    """Emitted with the rows whose formulas should be rendered."""
+
+    def __init__(self):
+        super().__init__()
+        self.formulas: list[str] = list()
+        self.svgs: dict[int, bytes] = dict()
+        self.sizes: dict[int, QSize] = dict()
+        self.errors: dict[int, str] = dict()
+        self._pending: set[int] = set()
+        self._requested: list[int] = list()
+        self._request_timer = QTimer()
+        self._request_timer.setSingleShot(True)
+        self._request_timer.setInterval(0)
+        self._request_timer.timeout.connect(self._emit_requests)
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.formulas)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.formulas[row]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.formulas[row] if row not in self.errors else f"{self.formulas[row]}\n\n{self.errors[row]}"
+        if role == self.SvgRole:
+            return self.svgs.get(row)
+        if role == self.SizeRole:
+            return self.sizes.get(row)
+        if role == self.ErrorRole:
+            return self.errors.get(row)
+        return None
+
+    def append(self, formulas: list[str]):
+        self.beginInsertRows(QModelIndex(), len(self.formulas), len(self.formulas) + len(formulas) - 1)
+        self.formulas.extend(formulas)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.formulas.clear()
+        self.svgs.clear()
+        self.sizes.clear()
+        self.errors.clear()
+        self._pending.clear()
+        self._requested.clear()
+        self.endResetModel()
+
+    def request(self, row: int):
+        """Requests the render of the formula in the `row`, unless it is already rendered, pending or failed."""
+        if row in self.svgs or row in self._pending or row in self.errors:
+            return
+        self._pending.add(row)
+        self._requested.append(row)
+        self._request_timer.start()
+
+    def set_svgs(self, rows: list[int], svgs: list[bytes]):
+        for row, svg in zip(rows, svgs):
+            self._pending.discard(row)
+            self.svgs[row] = svg
+            self.sizes[row] = QSvgRenderer(QByteArray(svg)).defaultSize()
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [self.SvgRole, self.SizeRole])
+
+    def fail(self, rows: list[int], error: str):
+        """Marks the renders of the formulas in the `rows` as failed with the `error` message."""
+        for row in rows:
+            self._pending.discard(row)
+            self.errors[row] = error
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [self.ErrorRole])
+
+    def _emit_requests(self):
+        rows, self._requested = sorted(self._requested), list()
+        if rows:
+            self.render_requested.emit(rows)
+
+
+class FormulaDelegate(QStyledItemDelegate):
+    """Paints the rendered formulas of a `FormulaListModel`, scaled down to the width of the view if necessary.
+
+    The rasterized formulas are kept in a least recently used cache,
+    which drops the pixmaps of formulas scrolled out of view once it exceeds `max_cache_bytes`.
+    Thus, the memory for the pixmaps scales with the size of the view rather than the count of formulas.
+
+    :cvar padding:
+        The space (in pixels) around each formula.
+    :cvar placeholder_height:
+        The height of a formula that is not rendered yet.
+    """
+    padding = 8
+    placeholder_height = 60
+
+    def __init__(self, view: QListView, max_cache_bytes: int = PIXMAP_CACHE_MAX_BYTES):
+        super().__init__(view)
+        self.view = view
+        self.max_cache_bytes = max_cache_bytes
+        self._cache: OrderedDict[tuple[str, int, int], QPixmap] = OrderedDict()
+        self._cache_bytes = 0
+
+    def formula_size(self, index: QModelIndex) -> Optional[QSize]:
+        """The size to show the formula at `index` in, `None` while it is not rendered yet."""
+        size: Optional[QSize] = index.data(FormulaListModel.SizeRole)
+        if size is None:
+            return None
+        max_width = self.view.viewport().width() - 2 * self.padding
+        if 0 < max_width < size.width():
+            size = size.scaled(max_width, size.height(), Qt.AspectRatioMode.KeepAspectRatio)
+        return size
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        size = self.formula_size(index)
+        if size is None:
+            return QSize(self.view.viewport().width(), self.placeholder_height)
+        return size.grownBy(QMargins(self.padding, self.padding, self.padding, self.padding))
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        style = option.widget.style() if option.widget is not None else self.view.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, option.widget)
+        rect = option.rect.adjusted(self.padding, self.padding, -self.padding, -self.padding)
+
+        svg: Optional[bytes] = index.data(FormulaListModel.SvgRole)
+        if svg is None:
+            error: Optional[str] = index.data(FormulaListModel.ErrorRole)
+            painter.save()
+            if error is None:
+                index.model().request(index.row())
+                # ↑ Only the visible rows are painted, so only these are rendered.
+                painter.setPen(option.palette.color(QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text))
+                text = index.data()
+            else:
+                painter.setPen(Qt.GlobalColor.red)
+                message = next(iter(error.strip().splitlines()), "")
+                # ↑ The tooltip shows the whole message, which might span many lines of a TeX log.
+                text = f"Unable to render {index.data()}: {message}"
+            text = painter.fontMetrics().elidedText(text, Qt.TextElideMode.ElideRight, rect.width())
+            painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+            painter.restore()
+            return
+
+        size = self.formula_size(index)
+        ratio = self.view.devicePixelRatioF()
+        pixmap = self._pixmap(index.data(), svg, QSize(round(size.width() * ratio), round(size.height() * ratio)),
+                              ratio)
+        target = QRect(rect.topLeft(), size)
+        target.moveCenter(rect.center())
+        painter.drawPixmap(target.topLeft(), pixmap)
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def _pixmap(self, formula: str, svg: bytes, size: QSize, ratio: float) -> QPixmap:
+        """Returns the `svg` rasterized at `size` (in physical pixels) for the device pixel `ratio`."""
+        key = (formula, size.width(), size.height())
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        with span("list.rasterize", size=f"{size.width()}x{size.height()}"):
+            image = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            QSvgRenderer(QByteArray(svg)).render(painter)
+            painter.end()
+            pixmap = QPixmap.fromImage(image)
+            pixmap.setDevicePixelRatio(ratio)
+
+        self._cache[key] = pixmap
+        self._cache_bytes += _pixmap_bytes(key)
+        while self._cache_bytes > self.max_cache_bytes and len(self._cache) > 1:
+            dropped, _ = self._cache.popitem(last=False)
+            self._cache_bytes -= _pixmap_bytes(dropped)
+            # ↑ The least recently painted pixmaps are the ones scrolled out of view.
+        return pixmap
+
+
+def _pixmap_bytes(key: tuple[str, int, int]) -> int:
+    """The memory of a cached pixmap, which holds 4 bytes per pixel."""
+    return key[1] * key[2] * 4
+
+
+class FormulaListView(QListView):
+    """A virtualized list of formulas, which only renders and rasterizes the formulas scrolled into view.
+    Ctrl + C copies the LaTeX of the selected formula."""
+
+    def __init__(self, model: Optional[FormulaListModel] = None):
+        super().__init__()
+        self.setModel(model if model is not None else FormulaListModel())
+        self.delegate = FormulaDelegate(self)
+        self.setItemDelegate(self.delegate)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        # ↑ Lay out the items again on resizing, as wide formulas are scaled to the width of the view.
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setToolTip("Ctrl + C to copy the selected formula")
+
+    def model(self) -> FormulaListModel:
+        return super().model()
+
+    def dataChanged(self, top_left: QModelIndex, bottom_right: QModelIndex, roles: list[int] = ()):
+        super().dataChanged(top_left, bottom_right, roles)
+        if FormulaListModel.SizeRole in roles:
+            self.scheduleDelayedItemsLayout()
+            # ↑ The size of a formula is only known once it is rendered.
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.matches(QKeySequence.StandardKey.Copy) and self.currentIndex().isValid():
+            pyperclip.copy(self.currentIndex().data())
+            return
+        super().keyPressEvent(event)
+
+    def clear(self):
+        self.model().clear()
+        self.delegate.clear_cache()
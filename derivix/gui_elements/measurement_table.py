@@ -0,0 +1,339 @@
+"""This module contains the `MeasurementTable`, which evaluates a formula for a whole series of measurements.
+
+The values are held in NumPy arrays rather than one object per cell, and the text of a cell is only formatted
+once the view shows it. Thus, tables with hundreds of thousands of rows stay responsive.
+"""
+import csv
+import io
+import math
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QPersistentModelIndex, Qt, Signal
+from PySide6.QtGui import QKeySequence, QKeyEvent
+from PySide6.QtWidgets import QWidget, QTableView, QPushButton, QGridLayout, QHeaderView, QApplication, \
+    QFileDialog, QLabel
+
+from derivix.gui_elements.abstracts import WidgetControl
+from derivix.utils.number_formatting import number_to_scientific
+
+if TYPE_CHECKING:
+    import numpy as np
+    from sympy import Symbol
+# ↑ NumPy is only imported once a table is filled, so it does not slow down the startup.
+
+UNCERTAINTY_PREFIXES = ("Δ", "delta_")
+"""The prefixes that mark the column of an uncertainty in a CSV header, e.g. `Δx` or `delta_x`."""
+
+
+class MeasurementModel(QAbstractTableModel):
+    """A table of measurements with a column for the value and one for the uncertainty of each symbol,
+    followed by a column for each result and its uncertainty.
+
+    Missing values are stored as NaN and shown as empty cells. The results are computed elsewhere
+    (see `MainWindow.evaluate_table()`) and passed in via `set_results()`, batch by batch.
+
+    Use `inputs_changed` to recompute the results whenever a value is entered, pasted or loaded.
+    """
+    inputs_changed = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.symbols: list["Symbol"] = list()
+        self.outputs: list[str] = list()
+        self.inputs: Optional["np.ndarray"] = None
+        """The values and uncertainties, of shape `(rows, 2 * len(symbols))`. `None` while there are no rows."""
+        self.results: Optional["np.ndarray"] = None
+        """The results and their uncertainties, of shape `(rows, 2 * len(outputs))`."""
+
+    # region: QAbstractTableModel
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() or self.inputs is None else len(self.inputs)
+
+    def columnCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2 * (len(self.symbols) + len(self.outputs))
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Vertical:
+            return str(section + 1)
+        return self.column_names()[section]
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        value = self._value(index.row(), index.column())
+        if math.isnan(value):
+            return ""
+        if role == Qt.ItemDataRole.EditRole:
+            return repr(value)
+        return number_to_scientific(value)
+        # ↑ Only called for the visible cells, so only these are ever formatted.
+
+    def setData(self, index: QModelIndex | QPersistentModelIndex, value, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or index.column() >= 2 * len(self.symbols):
+            return False
+        number = _parse_number(value)
+        if number is None:
+            return False
+        self.inputs[index.row(), index.column()] = number
+        self.dataChanged.emit(index, index)
+        self.inputs_changed.emit()
+        return True
+
+    def flags(self, index: QModelIndex | QPersistentModelIndex) -> Qt.ItemFlag:
+        flags = super().flags(index)
+        if index.column() < 2 * len(self.symbols):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+    # endregion
+
+    def column_names(self) -> list[str]:
+        names = [name for symbol in self.symbols for name in (symbol.name, f"Δ{symbol.name}")]
+        return names + [name for output in self.outputs for name in (output, f"Δ{output}")]
+
+    def set_symbols(self, symbols: list["Symbol"]):
+        """Sets the symbols to enter values for. Values of symbols with the same name as before are kept."""
+        import numpy as np
+
+        self.beginResetModel()
+        if self.inputs is not None:
+            previous = {symbol.name: index for index, symbol in enumerate(self.symbols)}
+            inputs = np.full((len(self.inputs), 2 * len(symbols)), np.nan)
+            for index, symbol in enumerate(symbols):
+                if symbol.name in previous:
+                    old = previous[symbol.name]
+                    inputs[:, 2 * index:2 * index + 2] = self.inputs[:, 2 * old:2 * old + 2]
+            self.inputs = inputs
+        self.symbols = list(symbols)
+        self.outputs = list()
+        self.results = None if self.inputs is None else np.full((len(self.inputs), 0), np.nan)
+        self.endResetModel()
+
+    def set_outputs(self, outputs: list[str]):
+        """Sets the names of the results, which are empty until set by `set_results()`."""
+        import numpy as np
+
+        self.beginResetModel()
+        self.outputs = list(outputs)
+        if self.inputs is not None:
+            self.results = np.full((len(self.inputs), 2 * len(outputs)), np.nan)
+        self.endResetModel()
+
+    def set_results(self, start: int, values: "np.ndarray", uncertainties: "np.ndarray"):
+        """Sets the results of the rows from `start` on, with `values` and `uncertainties` of shape `(rows, outputs)`.
+        Results of rows that were removed in the meantime are ignored."""
+        if self.results is None or self.results.shape[1] != 2 * values.shape[1]:
+            return
+        stop = min(start + len(values), len(self.results))
+        if stop <= start:
+            return
+        self.results[start:stop, 0::2] = values[:stop - start]
+        self.results[start:stop, 1::2] = uncertainties[:stop - start]
+        self.dataChanged.emit(
+            self.index(start, 2 * len(self.symbols)), self.index(stop - 1, self.columnCount() - 1)
+        )
+
+    def clear(self):
+        self.beginResetModel()
+        self.inputs = None
+        self.results = None
+        self.endResetModel()
+        self.inputs_changed.emit()
+
+    def paste(self, text: str, row: int = 0, column: int = 0):
+        """Pastes the `text` of separated values (as copied from a spreadsheet) with its top left cell at `row`
+        and `column`, adding rows as needed. Cells that are not a number are left empty."""
+        table = _parse_table(io.StringIO(text))
+        if table.size != 0:
+            self._write(table, row, column)
+
+    def load_csv(self, file: Path):
+        """Replaces all rows by the ones in the CSV `file`, whose header names the columns.
+        The header matches the column names, where uncertainties can also be prefixed by `delta_` instead of `Δ`.
+        Columns that do not match any symbol are ignored."""
+        import numpy as np
+
+        with open(file, newline="", encoding="utf-8-sig") as stream:
+            try:
+                delimiter = csv.Sniffer().sniff(stream.readline() + stream.readline(), delimiters=",;\t").delimiter
+            except csv.Error:
+                delimiter = ","
+                # ↑ A file with a single column has no delimiter to detect.
+            stream.seek(0)
+            header = next(csv.reader(stream, delimiter=delimiter), [])
+            table = _parse_table(stream, delimiter, columns=len(header))
+
+        names = {name: index for index, name in enumerate(self.column_names()[:2 * len(self.symbols)])}
+        inputs = np.full((len(table), 2 * len(self.symbols)), np.nan)
+        for source, name in enumerate(header):
+            name = name.strip()
+            for prefix in UNCERTAINTY_PREFIXES[1:]:
+                if name.startswith(prefix):
+                    name = UNCERTAINTY_PREFIXES[0] + name.removeprefix(prefix)
+            if name in names:
+                inputs[:, names[name]] = table[:, source]
+        self._set_inputs(inputs)
+
+    def save_csv(self, file: Path):
+        """Writes all columns, including the results, to the CSV `file`."""
+        import numpy as np
+
+        with open(file, "w", newline="", encoding="utf-8") as stream:
+            stream.write(",".join(self.column_names()) + "\n")
+            if self.inputs is not None:
+                np.savetxt(stream, np.hstack((self.inputs, self.results)), delimiter=",", fmt="%.17g")
+
+    def _value(self, row: int, column: int) -> float:
+        if column < 2 * len(self.symbols):
+            return float(self.inputs[row, column])
+        return float(self.results[row, column - 2 * len(self.symbols)])
+
+    def _write(self, table: "np.ndarray", row: int, column: int):
+        import numpy as np
+
+        width = min(table.shape[1], 2 * len(self.symbols) - column)
+        if width <= 0:
+            return
+        rows = max(row + len(table), self.rowCount())
+        inputs = np.full((rows, 2 * len(self.symbols)), np.nan)
+        if self.inputs is not None:
+            inputs[:len(self.inputs)] = self.inputs
+        inputs[row:row + len(table), column:column + width] = table[:, :width]
+        self._set_inputs(inputs)
+
+    def _set_inputs(self, inputs: "np.ndarray"):
+        import numpy as np
+
+        self.beginResetModel()
+        self.inputs = inputs
+        self.results = np.full((len(inputs), 2 * len(self.outputs)), np.nan)
+        self.endResetModel()
+        self.inputs_changed.emit()
+
+
+def _parse_number(text) -> Optional[float]:
+    """Parses a cell, where an empty cell is NaN. Returns `None` if the text is not a number."""
+    text = str(text).strip()
+    if text == "":
+        return math.nan
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _parse_table(stream: io.TextIOBase, delimiter: Optional[str] = None, columns: Optional[int] = None) \
+        -> "np.ndarray":
+    """Parses the rows of separated values in `stream` into an array, with NaN for each empty or invalid cell.
+    Without a `delimiter`, tabs are used if the text contains any and commas otherwise."""
+    import numpy as np
+
+    text = stream.read()
+    if delimiter is None:
+        delimiter = "\t" if "\t" in text else ","
+    try:
+        table = np.loadtxt(io.StringIO(text), delimiter=delimiter, ndmin=2, dtype=float)
+        # ↑ The fast path for complete tables. Fails on empty or invalid cells.
+    except ValueError:
+        rows = [
+            [_parse_number(cell) for cell in row] for row in csv.reader(io.StringIO(text), delimiter=delimiter)
+            if len(row) > 1 or (row and row[0].strip())
+        ]
+        # ↑ Via `csv`, as spreadsheets may quote cells, e.g. `"1.5"`. Blank lines are skipped.
+        width = max((len(row) for row in rows), default=0)
+        table = np.full((len(rows), width), np.nan)
+        for index, row in enumerate(rows):
+            table[index, :len(row)] = [math.nan if cell is None else cell for cell in row]
+    if columns is not None and table.shape[1] < columns:
+        table = np.hstack((table, np.full((len(table), columns - table.shape[1]), np.nan)))
+    return table
+
+
+class MeasurementView(QTableView):
+    """A `QTableView` for the `MeasurementModel`, which supports pasting with Ctrl + V
+    and copying the selected cells with Ctrl + C."""
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.matches(QKeySequence.StandardKey.Paste):
+            index = self.currentIndex()
+            self.model().paste(QApplication.clipboard().text(), max(index.row(), 0), max(index.column(), 0))
+            return
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy_selection()
+            return
+        super().keyPressEvent(event)
+
+    def copy_selection(self):
+        indexes = self.selectedIndexes()
+        if not indexes:
+            return
+        rows = range(min(i.row() for i in indexes), max(i.row() for i in indexes) + 1)
+        columns = range(min(i.column() for i in indexes), max(i.column() for i in indexes) + 1)
+        model = self.model()
+        text = "\n".join(
+            "\t".join(model.data(model.index(row, column), Qt.ItemDataRole.EditRole) for column in columns)
+            for row in rows
+        )
+        QApplication.clipboard().setText(text)
+
+
+class MeasurementTable(QWidget, WidgetControl):
+    """A table to evaluate the formula for a series of measurements, as alternative to entering them in the cards.
+    Rows can be pasted from a spreadsheet (Ctrl + V) or loaded from a CSV file."""
+
+    def __init__(self):
+        super().__init__()
+        self.init_widget()
+
+    def init_content(self):
+        self.model = MeasurementModel()
+        self.view = MeasurementView()
+        self.load_button = QPushButton()
+        self.save_button = QPushButton()
+        self.clear_button = QPushButton()
+        self.status = QLabel()
+
+    def init_positions(self):
+        self.setLayout(QGridLayout())
+        self.layout_.setContentsMargins(0, 0, 0, 0)
+        self.layout_.addWidget(self.view, 1, 1, 1, 4)
+        self.layout_.addWidget(self.status, 2, 1)
+        self.layout_.addWidget(self.load_button, 2, 2)
+        self.layout_.addWidget(self.save_button, 2, 3)
+        self.layout_.addWidget(self.clear_button, 2, 4)
+
+    def init_style(self):
+        self.view.setMinimumHeight(240)
+        header = self.view.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        header.setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        # ↑ With a fixed height, the view does not need to measure every row, which matters for large tables.
+        self.layout_.setColumnStretch(1, 1)
+
+    def init_values(self):
+        self.view.setModel(self.model)
+        self.load_button.setText("Load CSV...")
+        self.save_button.setText("Save CSV...")
+        self.clear_button.setText("Clear")
+        self.view.setToolTip("Paste rows with Ctrl + V, copy the selected cells with Ctrl + C")
+
+    def init_control(self):
+        self.load_button.clicked.connect(self.load_csv)
+        self.save_button.clicked.connect(self.save_csv)
+        self.clear_button.clicked.connect(self.model.clear)
+
+    @property
+    def layout_(self) -> QGridLayout:
+        return self.layout()
+
+    def load_csv(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Load Measurements", "", "CSV Files (*.csv *.tsv *.txt)")
+        if file:
+            self.model.load_csv(Path(file))
+
+    def save_csv(self):
+        file, _ = QFileDialog.getSaveFileName(self, "Save Measurements", "", "CSV Files (*.csv)")
+        if file:
+            self.model.save_csv(Path(file))
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from typing import Optional
+
+from PySide6.QtCore import QByteArray, QSize, QRectF, QPointF, Qt
+from PySide6.QtGui import QPainter, QPixmap, QImage, QWheelEvent, QMouseEvent, QPaintEvent, QKeyEvent
+from PySide6.QtSvg import QSvgRenderer
+from PySide6.QtWidgets import QWidget
+
+from derivix.utils.tracing import span
+
+
+class SvgView(QWidget):
+    """A widget that paints an SVG as vector graphic, sharp at any size and device pixel ratio.
+
+    The SVG is fitted into the `base_size`, which is its natural size limited to `max_width`.
+    It can be zoomed by Ctrl + mouse wheel (or Ctrl + `+`/`-`, Ctrl + `0` to reset) and panned by dragging,
+    so very large formulas can be inspected without rendering them again.
+
+    The rasterization for each zoom level is cached, so repainting (e.g. while panning) only copies a pixmap.
+    Rasterizations exceeding `max_cached_pixels` are not cached, instead only the visible part is painted.
+
+    :cvar zoom_step:
+        The factor by which each zoom step enlarges the SVG.
+    :cvar min_zoom_level, max_zoom_level:
+        The range of zoom levels, the zoom is `zoom_step ** zoom_level`.
+    """
+    zoom_step = 1.25
+    min_zoom_level = -6
+    max_zoom_level = 10
+    max_cached_pixels = 4096 * 4096
+    cache_size = 4
+
+    def __init__(self, max_width: Optional[int] = None):
+        super().__init__()
+        self.max_width = max_width
+        self.renderer = QSvgRenderer()
+        self.zoom_level = 0
+        self.offset = QPointF()
+        # ↑ The top left corner of the visible part within the zoomed SVG.
+        self._cache: OrderedDict[tuple[int, int], QPixmap] = OrderedDict()
+        self._drag_start: Optional[QPointF] = None
+        self.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+        # ↑ Receive key events for zooming once clicked.
+
+    def load(self, svg: bytes):
+        """Shows the `svg` and resets the zoom."""
+        with span("display.load", bytes=len(svg)):
+            self.renderer.load(QByteArray(svg))
+        self._cache.clear()
+        self.reset_zoom()
+
+    def clear(self):
+        self.renderer.load(QByteArray())
+        self._cache.clear()
+        self.update()
+
+    @property
+    def base_size(self) -> QSize:
+        """The size of the SVG at zoom level `0`."""
+        size = self.renderer.defaultSize()
+        if self.max_width is not None and size.width() > self.max_width:
+            size = size.scaled(self.max_width, size.height(), Qt.AspectRatioMode.KeepAspectRatio)
+        return size
+
+    @property
+    def zoom(self) -> float:
+        return self.zoom_step ** self.zoom_level
+
+    @property
+    def content_size(self) -> QSize:
+        """The size of the SVG at the current zoom."""
+        return self.base_size * self.zoom
+
+    def sizeHint(self) -> QSize:
+        return self.base_size
+
+    def set_zoom_level(self, level: int, anchor: Optional[QPointF] = None):
+        """Zooms to the `level`, keeping the point at `anchor` (in widget coordinates) in place."""
+        level = max(self.min_zoom_level, min(self.max_zoom_level, level))
+        if level == self.zoom_level:
+            return
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        factor = self.zoom_step ** (level - self.zoom_level)
+        self.offset = (self.offset + anchor - self._origin()) * factor
+        self.zoom_level = level
+        self.offset -= anchor - self._origin()
+        self._clamp_offset()
+        self.update()
+
+    def reset_zoom(self):
+        self.zoom_level = 0
+        self.offset = QPointF()
+        self.update()
+
+    def paintEvent(self, event: QPaintEvent):
+        if not self.renderer.isValid():
+            return
+        painter = QPainter(self)
+        origin = self._origin() - self.offset
+        content = self.content_size
+        ratio = self.devicePixelRatioF()
+        key = (round(content.width() * ratio), round(content.height() * ratio))
+
+        if key[0] * key[1] > self.max_cached_pixels:
+            painter.setClipRect(event.rect())
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self.renderer.render(painter, QRectF(origin, content.toSizeF()))
+            # ↑ Too large to keep around, so render the visible part directly.
+        else:
+            painter.drawPixmap(origin, self._rasterize(key, ratio))
+        painter.end()
+
+    def _rasterize(self, size: tuple[int, int], ratio: float) -> QPixmap:
+        """Returns the SVG rasterized at `size` (in physical pixels) for the device pixel `ratio`."""
+        if size in self._cache:
+            self._cache.move_to_end(size)
+            return self._cache[size]
+        with span("display.rasterize", size=f"{size[0]}x{size[1]}"):
+            image = QImage(*size, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self.renderer.render(painter)
+            painter.end()
+            pixmap = QPixmap.fromImage(image)
+            pixmap.setDevicePixelRatio(ratio)
+        self._cache[size] = pixmap
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pixmap
+
+    def wheelEvent(self, event: QWheelEvent):
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            steps = round(event.angleDelta().y() / 120)
+            self.set_zoom_level(self.zoom_level + steps, event.position())
+        else:
+            delta = event.pixelDelta() if not event.pixelDelta().isNull() else event.angleDelta() / 4
+            self.offset -= QPointF(delta.x(), delta.y())
+            self._clamp_offset()
+            self.update()
+        event.accept()
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            if event.key() in (Qt.Key.Key_Plus, Qt.Key.Key_Equal):
+                self.set_zoom_level(self.zoom_level + 1)
+                return
+            if event.key() == Qt.Key.Key_Minus:
+                self.set_zoom_level(self.zoom_level - 1)
+                return
+            if event.key() == Qt.Key.Key_0:
+                self.reset_zoom()
+                return
+        super().keyPressEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_start = event.position()
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event: QMouseEvent):
+        if self._drag_start is not None:
+            self.offset -= event.position() - self._drag_start
+            self._drag_start = event.position()
+            self._clamp_offset()
+            self.update()
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        self._drag_start = None
+        self.unsetCursor()
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent):
+        self.reset_zoom()
+
+    def _origin(self) -> QPointF:
+        """The position of the SVG within the widget without any panning, centered if it is smaller."""
+        content = self.content_size
+        return QPointF(max(0.0, (self.width() - content.width()) / 2), max(0.0, (self.height() - content.height()) / 2))
+
+    def _clamp_offset(self):
+        """Limits the panning, so the SVG can not be moved out of view."""
+        content = self.content_size
+        self.offset = QPointF(
+            max(0.0, min(self.offset.x(), content.width() - self.width())),
+            max(0.0, min(self.offset.y(), content.height() - self.height())),
+        )
@@ -0,0 +1,198 @@
+"""This module contains the project files, which store a whole session to restore it without any recomputation.
+
+A project holds the LaTeX input with its parsed expression, the partial derivations by each symbol,
+the assignment and values of the symbols, and the rendered formulas. Loading a project thus neither parses,
+derives nor renders anything again.
+
+Projects are stored as JSON. Expressions are stored as `srepr`, which is readable and, unlike a pickle,
+does not depend on the installed sympy version. It reproduces the expressions up to the order of commutative
+arguments. SVGs are encoded as base64. Loading does not evaluate the stored expressions as Python code,
+it only calls the sympy classes they name. Text arguments are only passed to the classes that take a name
+or number literal, as any other class would evaluate them via `sympify()`.
+"""
+import ast
+import base64
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import sympy
+from sympy import Symbol, srepr
+
+from derivix.utils.tracing import span
+
+PROJECT_VERSION = 1
+"""The version of the file format, increased whenever it changes incompatibly."""
+PROJECT_SUFFIX = ".derivix"
+_LITERAL_CLASSES = {sympy.Symbol, sympy.Dummy, sympy.Function, sympy.Integer, sympy.Float, sympy.Rational}
+"""The classes that take a name or number as text argument, which they parse without `sympify()`."""
+
+
+@dataclass
+class SymbolState:
+    """The state of a symbol card."""
+    name: str
+    include: bool
+    """Whether the symbol is included in the uncertainty, see `Filter`."""
+    value: Optional[float] = None
+    uncertainty: Optional[float] = None
+
+
+@dataclass
+class DerivationState:
+    """The results of deriving the formula by the included `symbols`, as shown in the window."""
+    symbols: list[str]
+    gaussian_latex: list[str]
+    definitions_latex: list[str]
+    svgs: list[bytes]
+    """The renders of the `gaussian_latex` followed by the `definitions_latex`."""
+    partials_latex: list[str]
+    partial_svgs: dict[int, bytes] = field(default_factory=dict)
+    """The renders of the `partials_latex` by their index. Only the ones that were shown have been rendered."""
+
+
+@dataclass
+class Project:
+    latex: str
+    formula: sympy.Basic
+    svg: Optional[bytes]
+    partials: dict[Symbol, sympy.Basic]
+    """All partial derivations of the `formula` computed so far, see `DerivationStore`."""
+    symbols: list[SymbolState]
+    derivation: Optional[DerivationState] = None
+
+    def symbol(self, name: str) -> Symbol:
+        """Returns the symbol of the `formula` with the `name`."""
+        return next(symbol for symbol in self.formula.free_symbols if symbol.name == name)
+
+
+def save_project(project: Project, file: Path):
+    data = {
+        "version": PROJECT_VERSION,
+        "latex": project.latex,
+        "formula": srepr(project.formula),
+        "svg": _encode(project.svg),
+        "partials": {symbol.name: srepr(partial) for symbol, partial in project.partials.items()},
+        "symbols": [vars(state) for state in project.symbols],
+        "derivation": None,
+    }
+    if project.derivation is not None:
+        derivation = project.derivation
+        data["derivation"] = {
+            "symbols": derivation.symbols,
+            "gaussian_latex": derivation.gaussian_latex,
+            "definitions_latex": derivation.definitions_latex,
+            "svgs": [_encode(svg) for svg in derivation.svgs],
+            "partials_latex": derivation.partials_latex,
+            "partial_svgs": {str(row): _encode(svg) for row, svg in derivation.partial_svgs.items()},
+        }
+    with span("project.save"):
+        file.write_text(json.dumps(data), encoding="utf-8")
+
+
+def load_project(file: Path) -> Project:
+    """Loads the project stored in `file`.
+    Raises a `ValueError` if the file is not a project or was stored by an incompatible version."""
+    with span("project.load"):
+        data = json.loads(file.read_text(encoding="utf-8"))
+        if not isinstance(data, dict) or data.get("version") != PROJECT_VERSION:
+            raise ValueError(f"{file} is not a project of version {PROJECT_VERSION}.")
+
+        formula = _expression(data["formula"])
+        symbols = {symbol.name: symbol for symbol in formula.free_symbols}
+        derivation = data["derivation"]
+        if derivation is not None:
+            derivation = DerivationState(
+                symbols=derivation["symbols"],
+                gaussian_latex=derivation["gaussian_latex"],
+                definitions_latex=derivation["definitions_latex"],
+                svgs=[_decode(svg) for svg in derivation["svgs"]],
+                partials_latex=derivation["partials_latex"],
+                partial_svgs={int(row): _decode(svg) for row, svg in derivation["partial_svgs"].items()},
+            )
+        return Project(
+            latex=data["latex"],
+            formula=formula,
+            svg=_decode(data["svg"]),
+            partials={symbols[name]: _expression(partial) for name, partial in data["partials"].items()},
+            symbols=[SymbolState(**state) for state in data["symbols"]],
+            derivation=derivation,
+        )
+
+
+def _expression(text: str) -> sympy.Basic:
+    """Reconstructs an expression from its `srepr`.
+    Raises a `ValueError` if the `text` is anything but calls of sympy classes with literal arguments."""
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as err:
+        raise ValueError(f"Invalid expression `{text}`.") from err
+    with sympy.evaluate(False):
+        return _build(tree.body)
+        # ↑ Creates unevaluated expressions, which would otherwise be simplified into another structure.
+
+
+def _build(node: ast.expr):
+    """Creates the object that the `node` of an `srepr` stands for, without evaluating any code.
+    `sympy.sympify()` is based on `eval`, which would run any code stored in a project."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool, type(None))):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)) \
+            and isinstance(node.operand, ast.Constant) and isinstance(node.operand.value, (int, float)):
+        return -node.operand.value if isinstance(node.op, ast.USub) else node.operand.value
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return tuple(_build(element) for element in node.elts)
+    if isinstance(node, ast.Name):
+        value = getattr(sympy, node.id, None)
+        if isinstance(value, sympy.Basic) or _is_sympy_class(value):
+            return value
+            # ↑ Either a singleton such as `pi` or a class to be called.
+        if node.id in _sympy_classes():
+            return _sympy_classes()[node.id]
+        raise ValueError(f"Unknown name `{node.id}` in expression.")
+    if isinstance(node, ast.Call) and all(keyword.arg is not None for keyword in node.keywords):
+        cls = _build(node.func)
+        if not _is_sympy_class(cls):
+            raise ValueError(f"`{ast.unparse(node.func)}` can not be called in an expression.")
+        args = [_build(arg) for arg in node.args]
+        kwargs = {keyword.arg: _build(keyword.value) for keyword in node.keywords}
+        strings = cls in _LITERAL_CLASSES
+        if any(_contains_str(arg, nested=strings) for arg in args) or any(map(_contains_str, kwargs.values())):
+            raise ValueError(f"`{ast.unparse(node)}` passes text other than a name or number in an expression.")
+            # ↑ Most classes pass their arguments to `sympify()`, which would evaluate the text as code.
+        return cls(*args, **kwargs)
+        # ↑ An undefined function is a class created by a call, e.g. `Function('f')(Symbol('x'))`.
+    raise ValueError(f"Invalid syntax `{ast.unparse(node)}` in expression.")
+
+
+def _contains_str(value, nested: bool = False) -> bool:
+    """Whether the `value` is text or a tuple containing text. With `nested`, only text within a tuple counts."""
+    if isinstance(value, tuple):
+        return any(_contains_str(element) for element in value)
+    return isinstance(value, str) and not nested
+
+
+def _is_sympy_class(value) -> bool:
+    return isinstance(value, type) and issubclass(value, sympy.Basic)
+
+
+@lru_cache(maxsize=None)
+def _sympy_classes() -> dict[str, type]:
+    """All classes of sympy by name, including those that are not exported by `sympy`, e.g. `ExprCondPair`."""
+    classes, stack = dict(), [sympy.Basic]
+    while stack:
+        cls = stack.pop()
+        if (cls.__module__ or "").startswith("sympy.") and cls.__name__ not in classes:
+            classes[cls.__name__] = cls
+            stack.extend(cls.__subclasses__())
+    return classes
+
+
+def _encode(svg: Optional[bytes]) -> Optional[str]:
+    return None if svg is None else base64.b64encode(svg).decode("ascii")
+
+
+def _decode(svg: Optional[str]) -> Optional[bytes]:
+    return None if svg is None else base64.b64decode(svg)
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """The settings that affect the output of a formula render.
+    As the resulting SVG only depends on the formula and these settings, they also make up the key of the `RenderCache`.
+    """
+    fontsize: int = 72
+    usetex: bool = True
+    pad_inches: float = 0.1
+
+
+PREVIEW_SETTINGS = RenderSettings(usetex=False)
+"""The settings for a fast preview, rendered by matplotlib's built-in mathtext instead of an external TeX."""
@@ -0,0 +1,143 @@
+"""This module contains the batched rendering of formulas, which compiles multiple formulas in a single TeX run.
+
+Most of the time of a single usetex render goes into starting TeX and loading its fonts,
+so compiling all formulas of a derivation set at once costs about as much as compiling a single one.
+The resulting DVI holds one page per formula and is split into one SVG per formula by `dvisvgm`.
+"""
+import logging
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence, Optional
+
+from derivix.rendering import RenderSettings
+from derivix.rendering.pool import RenderTicket, RenderCancelled, RenderError, RenderPool
+from derivix.rendering.render import render_svg
+from derivix.utils.tracing import span
+
+TEX_BASE_SIZE = 10
+"""The font size (in pt) of the document class, used to scale the output to the desired font size."""
+
+document_template = \
+r"""\documentclass[%(base_size)dpt]{article}
+\usepackage{amsmath}
+\pagestyle{empty}
+\begin{document}
+%(pages)s
+\end{document}
+"""
+page_template = r"\mbox{$%s$}\clearpage"
+
+
+def batch_available() -> bool:
+    """Whether the tools required for batched rendering are installed."""
+    return shutil.which("latex") is not None and shutil.which("dvisvgm") is not None
+
+
+def render_svgs(formulas: Sequence[str], settings: RenderSettings = RenderSettings(),
+                ticket: Optional[RenderTicket] = None, pool: Optional[RenderPool] = None) -> list[bytes]:
+    """Renders all `formulas` and returns the content of the resulting SVGs, in the same order as the `formulas`.
+
+    With `usetex`, all formulas will be compiled in a single TeX run if the required tools are available.
+    If they are not available, or if the compilation fails (e.g. because a single formula is invalid),
+    each formula will be rendered on its own, so the error can be attributed to the corresponding formula.
+    If any of them fails, `RenderError` is raised, which holds the renders of the others.
+
+    Cancelling the `ticket` kills the TeX run, after which `RenderCancelled` is raised.
+    Without the batch, the formulas are rendered in parallel in the `pool`, where cancelling kills them as well.
+    Without a `pool`, they are rendered in the current process, so they can only be cancelled between two formulas.
+    """
+    if len(formulas) == 0:
+        return list()
+    if not settings.usetex or len(formulas) == 1 or not batch_available():
+        return _render_each(formulas, settings, ticket, pool)
+
+    try:
+        with span("render.batch", formulas=len(formulas)):
+            return _compile_batch(formulas, settings, ticket)
+    except (subprocess.CalledProcessError, RuntimeError) as err:
+        logging.info(f"Batched render failed, falling back to rendering each formula: {err}")
+        return _render_each(formulas, settings, ticket, pool)
+
+
+def _render_each(formulas: Sequence[str], settings: RenderSettings, ticket: Optional[RenderTicket],
+                 pool: Optional[RenderPool]) -> list[bytes]:
+    """Renders each formula on its own. Raises `RenderError` once all are done if any of them failed."""
+    def render(formula: str) -> bytes:
+        with span("render", characters=len(formula), usetex=settings.usetex, pool=pool is not None):
+            if pool is not None:
+                return pool.render(formula, settings, ticket)
+            if ticket is not None:
+                ticket.check()
+            return render_svg(formula, settings)
+
+    svgs: list[Optional[bytes]] = [None] * len(formulas)
+    errors: dict[int, Exception] = dict()
+    with ThreadPoolExecutor(max_workers=pool.processes if pool is not None else 1) as executor:
+        # ↑ Each thread only waits for its render process, so the formulas are rendered in parallel.
+        futures = [executor.submit(render, formula) for formula in formulas]
+        for index, future in enumerate(futures):
+            try:
+                svgs[index] = future.result()
+            except RenderCancelled:
+                raise
+            except Exception as err:
+                errors[index] = err
+    if errors:
+        raise RenderError(svgs, errors)
+    return svgs
+
+
+def _run(args: list[str], folder: Path, ticket: Optional[RenderTicket]):
+    """Runs the command like `subprocess.run(..., check=True)`, but kills it if the `ticket` is cancelled."""
+    process = subprocess.Popen(args, cwd=folder, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if ticket is not None and not ticket.attach(process):
+        process.kill()
+        process.communicate()
+        raise RenderCancelled()
+    try:
+        stdout, stderr = process.communicate()
+    finally:
+        if ticket is not None:
+            ticket.detach(process)
+    if ticket is not None:
+        ticket.check()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+
+
+def _compile_batch(formulas: Sequence[str], settings: RenderSettings,
+                   ticket: Optional[RenderTicket] = None) -> list[bytes]:
+    scale = settings.fontsize / TEX_BASE_SIZE
+    padding = settings.pad_inches * 72.27 / scale
+    # ↑ `dvisvgm` applies the padding before scaling, so it must be converted into unscaled TeX points.
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        source = document_template % {
+            "base_size": TEX_BASE_SIZE,
+            "pages": "\n".join(page_template % formula for formula in formulas),
+        }
+        (folder / "batch.tex").write_text(source, encoding="utf-8")
+
+        with span("tex", formulas=len(formulas)):
+            _run(["latex", "-interaction=nonstopmode", "-halt-on-error", "batch.tex"], folder, ticket)
+        with span("dvisvgm", formulas=len(formulas)):
+            _run(
+                ["dvisvgm", "--page=1-", "--no-fonts", f"--scale={scale}", f"--bbox={padding:.4f}pt",
+                 "--output=page-%p", "batch.dvi"],
+                folder, ticket
+            )
+
+        pages = dict()
+        for file in folder.glob("page-*.svg"):
+            page = int(re.fullmatch(r"page-0*(\d+)", file.stem).group(1))
+            # ↑ Depending on the page count, `dvisvgm` pads the page numbers with zeroes.
+            pages[page] = file.read_bytes()
+
+    if sorted(pages) != list(range(1, len(formulas) + 1)):
+        raise RuntimeError(f"Expected {len(formulas)} pages, but the batch produced {len(pages)}.")
+    return [pages[page] for page in range(1, len(formulas) + 1)]
@@ -0,0 +1,201 @@
+"""This module contains the `RenderCache` used to persist rendered formulas across renders and sessions."""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from threading import Lock
+from typing import Optional, Iterable
+
+from derivix.rendering import RenderSettings
+
+
+class RenderCache:
+    """A persistent, content-addressed cache for rendered formulas.
+
+    Each render is stored as file in `folder`, named by a hash of the LaTeX source and the `RenderSettings`.
+    The index of all files is kept in memory, so a lookup only costs a dictionary access,
+    and is written to `folder` so the cache survives across sessions.
+
+    The total size of all stored files is bounded by `max_bytes`.
+    When storing a new render exceeds that budget, the least recently used renders will be evicted.
+
+    The index is only read once the cache is first accessed, so creating a cache is free.
+    It is written at most every `save_interval` seconds while storing renders, and on exit.
+    Multiple processes may share the `folder`: Each keeps the renders and index entries of the others,
+    which it merges into its own index when reading or writing it.
+    All public methods are thread-safe.
+
+    :cvar save_interval:
+        The minimal time in seconds between two writes of the index when storing renders.
+    """
+    index_name = "index.json"
+    save_interval = 5.0
+
+    def __init__(self, folder: Path, max_bytes: int = 256 * 1024 ** 2):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        # ↑ Maps the key of each render to its size in bytes. Ordered from least to most recently used.
+        self._size = 0
+        self._lock = Lock()
+        self._loaded = False
+        self._saved_at = 0.0
+
+    @staticmethod
+    def key(formula: str, settings: RenderSettings) -> str:
+        """Returns the key under which the render of `formula` with `settings` is stored."""
+        source = json.dumps([formula, asdict(settings)], sort_keys=True)
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def get(self, formula: str, settings: RenderSettings) -> Optional[Path]:
+        """Returns the file of the cached render or `None` if the render is not cached."""
+        key = self.key(formula, settings)
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._entries:
+                return None
+            file = self._file(key)
+            if not file.exists():
+                # ↑ The file was removed externally, so the entry is outdated.
+                self._size -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return file
+
+    def load(self, formula: str, settings: RenderSettings) -> Optional[bytes]:
+        """Returns the content of the cached render or `None` if the render is not cached."""
+        file = self.get(formula, settings)
+        if file is None:
+            return None
+        try:
+            return file.read_bytes()
+        except FileNotFoundError:
+            return None
+            # ↑ The render was evicted in the meantime.
+
+    def put(self, formula: str, settings: RenderSettings, svg: bytes) -> Optional[Path]:
+        """Stores the rendered `svg` and returns the file it was stored in,
+        or `None` if the `svg` alone exceeds the budget, in which case it is not stored.
+        Evicts the least recently used renders if the budget is exceeded afterwards."""
+        if len(svg) > self.max_bytes:
+            return None
+        key = self.key(formula, settings)
+        file = self._file(key)
+        with self._lock:
+            self._ensure_loaded()
+            file.write_bytes(svg)
+            if key in self._entries:
+                self._size -= self._entries.pop(key)
+            self._entries[key] = len(svg)
+            self._size += len(svg)
+            self._evict()
+            # ↑ The new render is the most recently used one and fits the budget, so it is never evicted.
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save_index()
+        return file
+
+    def clear(self):
+        """Removes all renders from the cache."""
+        with self._lock:
+            self._ensure_loaded()
+            for file in self.folder.glob("*.svg"):
+                file.unlink(missing_ok=True)
+            self._entries.clear()
+            self._size = 0
+            self._save_index()
+
+    def save_index(self):
+        """Writes the index to disk. Is called automatically when storing renders and on exit."""
+        with self._lock:
+            if self._loaded:
+                self._save_index()
+
+    @property
+    def size(self) -> int:
+        """The total size of all cached renders in bytes."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._size
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def __contains__(self, item: tuple[str, RenderSettings]):
+        with self._lock:
+            self._ensure_loaded()
+            return self.key(*item) in self._entries
+
+    def _file(self, key: str) -> Path:
+        return self.folder / (key + ".svg")
+
+    def _evict(self):
+        """Removes the least recently used renders until the budget is met again.
+        Must be called while holding the lock."""
+        while self._size > self.max_bytes and len(self._entries) != 0:
+            key, size = self._entries.popitem(last=False)
+            self._file(key).unlink(missing_ok=True)
+            self._size -= size
+
+    def _ensure_loaded(self):
+        """Loads the index on first access. Must be called while holding the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+        atexit.register(self.save_index)
+        # ↑ Lookups only change the order of the index, which does not justify writing it on every access.
+
+    def _save_index(self):
+        """Merges the entries stored by other processes into the index and writes it to disk.
+        Must be called while holding the lock."""
+        self._merge(self._read_index())
+        self._evict()
+        index_file = self.folder / self.index_name
+        temp_file = index_file.with_name(f"{self.index_name}.{os.getpid()}.tmp")
+        # ↑ A file per process, as other processes sharing the folder might write their index at the same time.
+        temp_file.write_text(json.dumps(list(self._entries.items())))
+        os.replace(temp_file, index_file)
+        # ↑ Replace the index in one step so an interrupted write cannot corrupt it.
+        self._saved_at = time.monotonic()
+
+    def _load_index(self):
+        """Restores the index from disk, including the renders of other processes that are not indexed yet."""
+        self._merge(self._read_index())
+        known = set(self._entries)
+        orphans = [file for file in self.folder.glob("*.svg") if file.stem not in known]
+        self._merge((file.stem, file.stat().st_size) for file in orphans if file.exists())
+        # ↑ E.g. stored by a process that was killed before writing its index.
+        self._evict()
+        # ↑ The budget might have been lowered since the last session.
+        self._saved_at = time.monotonic()
+
+    def _read_index(self) -> list[tuple[str, int]]:
+        """Returns the entries of the index on disk. Must be called while holding the lock."""
+        index_file = self.folder / self.index_name
+        try:
+            return json.loads(index_file.read_text())
+        except FileNotFoundError:
+            return list()
+        except (json.JSONDecodeError, OSError) as err:
+            logging.warning(f"Unable to read the render cache index: {err}")
+            return list()
+
+    def _merge(self, entries: Iterable[tuple[str, int]]):
+        """Adds the `entries` unknown to this index whose files exist, as the least recently used ones.
+        Must be called while holding the lock."""
+        added = OrderedDict(
+            (key, size) for key, size in entries if key not in self._entries and self._file(key).exists()
+        )
+        # ↑ An entry without a file was evicted, by this process or another one.
+        if added:
+            self._size += sum(added.values())
+            added.update(self._entries)
+            self._entries = added
@@ -0,0 +1,242 @@
+"""This module contains the `RenderPool`, which renders formulas in long-lived processes.
+
+As a render runs in a separate process, it can be cancelled mid-flight by killing that process (see `RenderTicket`),
+which the pool then replaces with a new one.
+"""
+import logging
+import os
+import signal
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from queue import Queue
+from threading import Lock
+from subprocess import Popen
+from typing import Optional
+
+from derivix.rendering import RenderSettings
+from derivix.utils.env import RENDER_PROCESSES
+
+
+class RenderCancelled(Exception):
+    """Raised by a render whose `RenderTicket` was cancelled."""
+
+
+class RenderError(RuntimeError):
+    """Raised when rendering some of multiple formulas failed, while the others may have succeeded.
+
+    :ivar svgs:
+        The content of the SVG of each formula, in the order of the formulas, `None` for each that failed.
+    :ivar errors:
+        The exception of each formula that failed, by its index.
+    """
+
+    def __init__(self, svgs: list[Optional[bytes]], errors: dict[int, Exception]):
+        super().__init__(str(next(iter(errors.values()))))
+        # ↑ The message of the first error, which is the whole message of a single formula.
+        self.svgs = svgs
+        self.errors = errors
+
+
+class RenderTicket:
+    """Identifies the renders of a single job, so they can be cancelled together once the job is outdated.
+
+    Each process that works on the job (a `RenderProcess` or a TeX subprocess) is attached to the ticket while it does.
+    `cancel()` kills all attached processes, so they stop using CPU immediately,
+    and any render of the job raises `RenderCancelled`.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._processes: list["RenderProcess | Popen"] = list()
+        self._killed: list["RenderProcess | Popen"] = list()
+        self._lock = Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for process in self._processes:
+                process.kill()
+            self._killed.extend(self._processes)
+            self._processes.clear()
+
+    def attach(self, process: "RenderProcess | Popen") -> bool:
+        """Attaches the `process` while it works on the job. Returns `False` if the ticket was cancelled already,
+        in which case the `process` must not start working on the job."""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._processes.append(process)
+            return True
+
+    def detach(self, process: "RenderProcess | Popen") -> bool:
+        """Detaches the `process` once it is done. Returns whether it was killed meanwhile."""
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+                return False
+            if process in self._killed:
+                self._killed.remove(process)
+                return True
+            return False
+
+    def check(self):
+        """Raises `RenderCancelled` if the ticket was cancelled."""
+        if self.cancelled:
+            raise RenderCancelled()
+
+
+def _serve(connection: Connection):
+    """The main loop of a render process.
+    Receives jobs as `(formula, settings)` over the `connection` and answers each with `(success, result)`,
+    where `result` is either the SVG or the exception that occurred.
+    Stops when receiving `None`.
+    """
+    import matplotlib
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+        # ↑ Start a process group, so a kill also reaches the TeX subprocesses started by matplotlib.
+    matplotlib.use("Agg")
+    from matplotlib import rc
+    from derivix.rendering.render import render_svg
+    rc('text', usetex=True)
+
+    while (job := connection.recv()) is not None:
+        formula, settings = job
+        try:
+            connection.send((True, render_svg(formula, settings)))
+        except Exception as err:
+            try:
+                connection.send((False, err))
+            except Exception:
+                # ↑ Not every exception can be pickled, so fall back to its message.
+                connection.send((False, RuntimeError(str(err))))
+
+
+class RenderProcess:
+    """A single long-lived process that renders the formulas it receives over a pipe.
+    The process imports and configures matplotlib once at startup, so each render skips that setup.
+    """
+
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def render(self, formula: str, settings: RenderSettings) -> bytes:
+        """Renders the `formula` in this process. Blocks until the render is done."""
+        self.connection.send((formula, settings))
+        success, result = self.connection.recv()
+        if not success:
+            raise result
+        return result
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        """Stops the process immediately, even during a render."""
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                return
+            except OSError:
+                pass
+                # ↑ The process has not started its process group yet.
+        self.process.kill()
+
+    def close(self):
+        """Stops the process after it finished its current job."""
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.connection.close()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+
+
+class RenderPool:
+    """A pool of up to `processes` `RenderProcess`, so formulas can be rendered in parallel.
+
+    `render()` is blocking and occupies one process for the duration of the render,
+    so to render multiple formulas in parallel, call it from multiple threads.
+    When all processes are busy, the call starts another one, or waits for the next process to become idle
+    once there are `processes`. Call `start()` to start all of them ahead of the first render.
+
+    The processes are started via `spawn`, as forking a process that runs Qt threads is not safe.
+    Thus, the pool must not be started on import of the main module.
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        self.processes = max(1, processes or RENDER_PROCESSES)
+        self._context = get_context("spawn")
+        self._idle: Queue[RenderProcess] = Queue()
+        self._all: list[RenderProcess] = list()
+        self._closed = False
+        self._lock = Lock()
+        # ↑ Guards `_all` and `_closed`, as renders replace their processes from multiple threads.
+
+    def start(self):
+        """Starts all processes that are not running yet, so they have set up matplotlib before the first render."""
+        with self._lock:
+            while not self._closed and len(self._all) < self.processes:
+                self._add_process()
+
+    def render(self, formula: str, settings: RenderSettings = RenderSettings(),
+               ticket: Optional[RenderTicket] = None) -> bytes:
+        """Renders the `formula` in the next idle process and returns the content of the resulting SVG.
+
+        If the `ticket` is cancelled during the render, the process will be killed and replaced,
+        and `RenderCancelled` is raised.
+        """
+        with self._lock:
+            if self._idle.empty() and not self._closed and len(self._all) < self.processes:
+                self._add_process()
+        process = self._idle.get()
+        if ticket is not None and not ticket.attach(process):
+            self._idle.put(process)
+            raise RenderCancelled()
+
+        died = False
+        try:
+            return process.render(formula, settings)
+        except (EOFError, BrokenPipeError, ConnectionResetError) as err:
+            died = True
+            if ticket is not None and ticket.cancelled:
+                raise RenderCancelled() from err
+            logging.warning(f"A render process died unexpectedly, restarting it: {err!r}")
+            raise RuntimeError("The render process died unexpectedly.") from err
+        finally:
+            if ticket is not None:
+                died = ticket.detach(process) or died
+                # ↑ The ticket might have been cancelled right after the render finished, which killed the process.
+            if died:
+                self._replace(process)
+            else:
+                self._idle.put(process)
+
+    def close(self):
+        """Stops all processes. Renders that are still running finish, but their processes are not replaced."""
+        with self._lock:
+            self._closed = True
+            processes, self._all = self._all, list()
+        for process in processes:
+            process.close()
+
+    def _replace(self, process: RenderProcess):
+        process.close()
+        with self._lock:
+            if self._closed:
+                return
+            self._all.remove(process)
+            self._add_process()
+
+    def _add_process(self):
+        process = RenderProcess(self._context)
+        self._all.append(process)
+        self._idle.put(process)
@@ -0,0 +1,21 @@
+"""This module contains the actual rendering of formulas.
+It is kept free of any other application state so it can be imported by render processes with minimal cost."""
+from io import BytesIO
+
+from matplotlib.figure import Figure
+
+from derivix.rendering import RenderSettings
+
+
+def render_svg(formula: str, settings: RenderSettings = RenderSettings()) -> bytes:
+    """Renders the `formula` and returns the content of the resulting SVG.
+
+    Does not use `pyplot`, so renders in multiple threads do not share any global figure state.
+    """
+    fig = Figure(figsize=(0.01, 0.01))
+    fig.text(0, 0, f"${formula}$", fontsize=settings.fontsize, usetex=settings.usetex)
+    buffer = BytesIO()
+
+    fig.savefig(buffer, format="svg", transparent=True, bbox_inches='tight', pad_inches=settings.pad_inches)
+
+    return buffer.getvalue()
@@ -1,10 +1,27 @@
 import logging
-import tempfile
+import os
 from pathlib import Path
 # noinspection PyUnresolvedReferences
 from typing import Union, Optional
 
 logging.basicConfig(level=logging.INFO)
-TEMP = tempfile.TemporaryDirectory()
-TEMP_PATH = Path(TEMP.name)
-logging.info(f"Created temporary folder at: `{TEMP_PATH}`")
\ No newline at end of file
+
+CACHE_PATH = Path(os.environ.get("DERIVIX_CACHE", Path.home() / ".cache" / "derivix"))
+"""The folder for data that should persist across sessions. Can be overridden with `DERIVIX_CACHE`."""
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("DERIVIX_RENDER_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+"""The budget for the rendered formulas stored in `CACHE_PATH`.
+Can be overridden with `DERIVIX_RENDER_CACHE_MAX_BYTES`."""
+DERIVE_PROCESSES = int(os.environ.get("DERIVIX_DERIVE_PROCESSES", 1))
+"""The count of processes to derive formulas in parallel. Can be overridden with `DERIVIX_DERIVE_PROCESSES`."""
+RENDER_PROCESSES = int(os.environ.get("DERIVIX_RENDER_PROCESSES", min(os.cpu_count() or 1, 4)))
+"""The count of processes to render formulas in parallel, see `RenderPool`. Each one holds its own matplotlib,
+so there are no more than 4 by default. Can be overridden with `DERIVIX_RENDER_PROCESSES`."""
+TRACE_PATH = Path(os.environ["DERIVIX_TRACE"]) if os.environ.get("DERIVIX_TRACE") else None
+"""The file to write a trace of all pipeline stages to on exit, see `derivix.utils.tracing`.
+Tracing is disabled unless `DERIVIX_TRACE` is set."""
+STARTUP_BUDGET = float(os.environ.get("DERIVIX_STARTUP_BUDGET", 0.5))
+"""The time (in seconds) importing the GUI may take at most, see `python -m derivix.utils.startup`.
+Can be overridden with `DERIVIX_STARTUP_BUDGET`."""
+PIXMAP_CACHE_MAX_BYTES = int(os.environ.get("DERIVIX_PIXMAP_CACHE_MAX_BYTES", 64 * 1024 ** 2))
+"""The budget for the rasterized formulas kept in memory by a list of formulas, see `FormulaListView`.
+Can be overridden with `DERIVIX_PIXMAP_CACHE_MAX_BYTES`."""
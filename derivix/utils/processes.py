@@ -0,0 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import get_context
+
+
+@lru_cache(maxsize=None)
+def get_process_executor(processes: int) -> ProcessPoolExecutor:
+    """Returns a process pool with `processes` workers, which is kept alive to only pay the startup cost once.
+    Uses `spawn`, as forking a process that runs Qt threads is not safe."""
+    return ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn"))
@@ -0,0 +1,111 @@
+"""This module contains what keeps the startup of the GUI fast.
+
+The GUI does not import sympy, matplotlib and numpy on startup, as they take seconds to import. Instead,
+`start_preload()` imports them in a background thread once the window is shown, so they are usually loaded before
+the first formula is entered. If a formula is entered earlier, its worker just imports them itself.
+
+Run `python -m derivix.utils.startup` to report which modules the import of the GUI spends its time on.
+It fails if the import exceeds `STARTUP_BUDGET` or loads any of the `DEFERRED_MODULES`, so it can guard the startup.
+"""
+import argparse
+import logging
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from threading import Thread
+from typing import Optional, NamedTuple
+
+from derivix.utils.env import STARTUP_BUDGET
+
+DEFERRED_MODULES = ("sympy", "matplotlib", "numpy", "antlr4")
+"""The packages that must not be imported on startup, but only by `preload()` or where they are used."""
+GUI_MODULE = "derivix.gui"
+ROOT_PATH = Path(__file__).parent.parent.parent
+
+
+def preload():
+    """Imports and warms up everything the pipeline requires, so the first formula does not wait for it."""
+    start = time.perf_counter()
+    import derivix.deriver
+    import derivix.evaluation.monte_carlo
+    # ↑ Only imported to load them, which also loads sympy, matplotlib and numpy.
+    from derivix.rendering import PREVIEW_SETTINGS
+    from derivix.rendering.render import render_svg
+    from sympy.parsing.latex import parse_latex
+
+    parse_latex("x")
+    # ↑ The ANTLR parser is only loaded on the first parse. Bypasses `parse_formula()` to keep its cache clean.
+    render_svg("x", PREVIEW_SETTINGS)
+    # ↑ Loads the fonts used for the preview.
+    logging.info(f"Preloaded the pipeline in {time.perf_counter() - start:.2f} s.")
+
+
+def start_preload() -> Thread:
+    """Runs `preload()` in a background thread. Call it once the window is shown."""
+    thread = Thread(target=preload, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self: float
+    """The time (in seconds) spent on the module itself."""
+    cumulative: float
+    """The time (in seconds) spent on the module including the modules it imported."""
+    depth: int
+    """How deep the module is nested in the imports, `0` for modules imported directly."""
+
+
+def measure_imports(module: str = GUI_MODULE) -> list[ImportTime]:
+    """Imports the `module` in a new interpreter and returns the import time of each module it loaded,
+    in the order `-X importtime` reports them."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_PATH, capture_output=True, text=True, check=True
+    )
+    times = list()
+    for line in result.stderr.splitlines():
+        match = re.fullmatch(r"import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)", line)
+        if match is None:
+            continue
+            # ↑ The header and any logging of the imported modules.
+        self_us, cumulative_us, indent, name = match.groups()
+        times.append(ImportTime(name, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+    return times
+
+
+def report(times: list[ImportTime], budget: float = STARTUP_BUDGET, top: int = 15) -> bool:
+    """Prints the slowest imports and whether the import stayed within the `budget`. Returns whether it did."""
+    total = sum(entry.cumulative for entry in times if entry.depth == 0)
+    deferred = sorted({
+        entry.module.split(".")[0] for entry in times if entry.module.split(".")[0] in DEFERRED_MODULES
+    })
+
+    print(f"{'module':<48}{'self':>10}{'cumulative':>12}")
+    for entry in sorted(times, key=lambda e: e.cumulative, reverse=True)[:top]:
+        print(f"{entry.module:<48}{entry.self * 1000:>8.1f}ms{entry.cumulative * 1000:>10.1f}ms")
+    print(f"Total import time: {total:.3f} s (budget: {budget:.3f} s)")
+    if deferred:
+        print(f"Modules that should be deferred were imported on startup: {', '.join(deferred)}")
+    return total <= budget and not deferred
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="derivix.utils.startup", description="Reports the import time of the GUI."
+    )
+    parser.add_argument("--module", default=GUI_MODULE, help="The module to measure the import of.")
+    parser.add_argument(
+        "--budget", type=float, default=STARTUP_BUDGET,
+        help="The import time (in seconds) to stay within. Defaults to `DERIVIX_STARTUP_BUDGET`."
+    )
+    parser.add_argument("--top", type=int, default=15, help="The count of the slowest modules to list.")
+    args = parser.parse_args(args)
+    return 0 if report(measure_imports(args.module), args.budget, args.top) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""This module contains the tracing of the pipeline stages, to find out where the time of a slow derivation went.
+
+Tracing is enabled by setting the environment variable `DERIVIX_TRACE` to a file, which the trace will be written to
+on exit. The trace is in the Chrome trace event format, so it can be opened in `chrome://tracing` or
+https://ui.perfetto.dev. Each span records its wall time, the CPU time of its thread and arguments such as the size
+of the expressions it processed.
+
+When tracing is disabled, `span()` returns a shared no-op context manager and `traced()` returns the function as is,
+so the instrumentation costs next to nothing. Arguments that are expensive to determine should only be computed
+if the span is recording, which is the case if it yields a dict:
+
+    with span("derive", symbols=len(symbols)) as trace:
+        result = ...
+        if trace is not None:
+            trace["operations"] = count_ops(result)
+
+Processes started by `multiprocessing` (e.g. of the `RenderPool` or the CLI) record their spans as well.
+On exit, each of them writes its spans to a part file next to the trace, which the main process merges into the trace
+on its exit. Spans of processes that are killed (e.g. a cancelled render) or still running then are missing.
+"""
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, Optional, Callable, TypeVar, Iterable
+
+from derivix.utils.env import TRACE_PATH
+
+ENABLED = TRACE_PATH is not None
+"""Whether the spans are recorded."""
+
+_events: list[dict[str, Any]] = list()
+_thread_names: dict[int, str] = dict()
+_origin = int(os.environ.setdefault("DERIVIX_TRACE_ORIGIN", str(time.perf_counter_ns())))
+# ↑ Processes started by this one inherit its origin, so the timestamps of all processes line up.
+_pid = os.getpid()
+_disabled_span = nullcontext()
+
+F = TypeVar("F", bound=Callable)
+
+
+class Span:
+    """Records a single stage as complete event. Use `span()` instead of creating it directly."""
+    __slots__ = ("name", "args", "_start", "_cpu_start")
+
+    def __init__(self, name: str, args: dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> dict[str, Any]:
+        self._cpu_start = time.thread_time_ns()
+        self._start = time.perf_counter_ns()
+        return self.args
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter_ns()
+        self.args["cpu_ms"] = (time.thread_time_ns() - self._cpu_start) / 1e6
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        thread = threading.get_ident()
+        if thread not in _thread_names:
+            _thread_names[thread] = threading.current_thread().name
+        _events.append({
+            "name": self.name,
+            "ph": "X",
+            "ts": (self._start - _origin) / 1e3,
+            "dur": (end - self._start) / 1e3,
+            "pid": _pid,
+            "tid": thread,
+            "args": self.args,
+        })
+        # ↑ Appending to a list is atomic, so spans of multiple threads do not need a lock.
+
+
+def span(name: str, **args: Any) -> Span | nullcontext:
+    """Returns a context manager that records the time spent in its block as stage `name` with the `args`.
+    It yields the dict of arguments, to add more of them within the block, or `None` if tracing is disabled."""
+    if not ENABLED:
+        return _disabled_span
+    return Span(name, args)
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorates a function to record each of its calls as a span,
+    named `name` or the qualified name of the function."""
+    def decorator(func: F) -> F:
+        if not ENABLED:
+            return func
+
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with Span(span_name, dict()):
+                return func(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def events() -> list[dict[str, Any]]:
+    """Returns a copy of all spans recorded so far, as trace events."""
+    return list(_events)
+
+
+def export(file: Path, parts: Iterable[Path] = ()):
+    """Writes all spans recorded so far to the `file` in the Chrome trace event format,
+    together with the events of the trace files `parts`."""
+    trace = [
+        {"name": "thread_name", "ph": "M", "pid": _pid, "tid": thread, "args": {"name": name}}
+        for thread, name in list(_thread_names.items())
+    ]
+    trace.extend(events())
+    for part in parts:
+        try:
+            trace.extend(json.loads(part.read_text(encoding="utf-8"))["traceEvents"])
+        except (OSError, ValueError, KeyError) as err:
+            logging.warning(f"Could not merge the trace `{part}`: {err!r}")
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}, default=str), encoding="utf-8")
+    # ↑ `default=str` as arguments may hold values that are not serializable, e.g. sympy numbers.
+
+
+def _part_file(parent_pid: int, pid: int) -> Path:
+    """The file a process started by the process `parent_pid` writes its spans to on exit."""
+    return TRACE_PATH.with_name(f"{TRACE_PATH.name}.{parent_pid}.{pid}.part")
+
+
+def _export_on_exit():
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        export(_part_file(parent.pid, _pid))
+        return
+        # ↑ Every process of a pool runs `atexit` as well, so only the main process may write the trace.
+
+    parts = sorted(TRACE_PATH.parent.glob(f"{TRACE_PATH.name}.{_pid}.*.part"))
+    export(TRACE_PATH, parts)
+    for part in parts:
+        part.unlink(missing_ok=True)
+    logging.info(f"Wrote the trace of {len(_events)} spans and {len(parts)} other processes to `{TRACE_PATH}`.")
+
+
+if ENABLED:
+    atexit.register(_export_on_exit)
+    # ↑ The process pools of `concurrent.futures` are shut down before any `atexit` handler runs,
+    #   so their processes have written their spans by then.
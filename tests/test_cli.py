@@ -0,0 +1,36 @@
+import io
+import json
+
+from derivix.cli import read_jobs, process, main
+
+
+def test_read_lines():
+    jobs = list(read_jobs(io.StringIO("a b\n\n% comment\na + b\n"), "lines"))
+    assert jobs == [{"formula": "a b", "index": 0}, {"formula": "a + b", "index": 3}]
+
+
+def test_read_jsonl():
+    jobs = list(read_jobs(io.StringIO('{"formula": "a b", "id": "x", "symbols": ["a"]}\n'), "jsonl"))
+    assert jobs == [{"formula": "a b", "id": "x", "symbols": ["a"], "index": 0}]
+
+
+def test_read_jsonl_reports_invalid_lines():
+    file = io.StringIO('not json\n[1]\n{"id": "x"}\n{"formula": "a"}\n')
+    jobs = list(read_jobs(file, "jsonl"))
+    assert [job["index"] for job in jobs] == [0, 1, 2, 3]
+    results = [process(job, None) for job in jobs[:3]]
+    assert all("error" in result and "formula" not in result for result in results)
+    assert results[2]["id"] == "x"
+    assert "error" not in process(jobs[3], None)
+
+
+def test_svg_names_stay_in_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr("derivix.cli.render_svg", lambda formula, settings: b"<svg/>")
+    source = tmp_path / "jobs.jsonl"
+    source.write_text(json.dumps({"formula": "a b", "id": "../evil"}) + "\n", encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    folder = tmp_path / "svgs"
+    assert main([str(source), "-o", str(output), "--svg", str(folder), "-p", "1"]) == 0
+    result = json.loads(output.read_text(encoding="utf-8"))
+    assert [file.name for file in folder.iterdir()] == [".._evil.svg"]
+    assert result["svg"] == str(folder / ".._evil.svg")
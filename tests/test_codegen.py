@@ -0,0 +1,90 @@
+import ctypes
+import shutil
+import subprocess
+import types
+
+import numpy as np
+import pytest
+
+from derivix.deriver import parse_formula, derive_by_symbols
+from derivix.evaluation.codegen import generate_python, generate_c
+from derivix.evaluation.compiled import compile_formula, compile_formulas
+
+FORMULA = r"\frac{\rho_{1} x^2 \sin(z)}{y} + e^{y}"
+FORMULAS = r"\frac{a}{b} + c; a b; \sqrt{a}"
+
+
+def _export(latex: str):
+    formula = parse_formula(latex)
+    symbols = [symbol for symbol in sorted(formula.free_symbols, key=lambda sym: sym.name) if symbol.name != "e"]
+    partials = derive_by_symbols(formula, symbols)
+    rng = np.random.default_rng(0)
+    values = {symbol: rng.uniform(1, 2, 5) for symbol in symbols}
+    uncertainties = {symbol: rng.uniform(0, 0.1, 5) for symbol in symbols}
+    return formula, symbols, partials, values, uncertainties
+
+
+def _module(code: str) -> types.ModuleType:
+    module = types.ModuleType("generated")
+    exec(compile(code, "generated", "exec"), module.__dict__)
+    return module
+
+
+def test_python_single_formula():
+    formula, symbols, partials, values, uncertainties = _export(FORMULA)
+    module = _module(generate_python(formula, partials, latex=FORMULA))
+    assert module.INPUTS == ("rho_1", "x", "y", "z")
+    assert module.MEASURANDS == module.INPUTS
+    assert module.OUTPUTS == ("f",)
+
+    args = [values[symbol] for symbol in symbols] + [uncertainties[symbol] for symbol in symbols]
+    value, uncertainty = module.evaluate(*args)
+    expected_value, expected_uncertainty = compile_formula(formula, tuple(partials.items())).evaluate(
+        values, uncertainties
+    )
+    np.testing.assert_allclose(value, expected_value)
+    np.testing.assert_allclose(uncertainty, expected_uncertainty)
+    np.testing.assert_allclose(module.uncertainty(*args), expected_uncertainty)
+
+
+def test_python_multiple_formulas():
+    formula, symbols, partials, values, uncertainties = _export(FORMULAS)
+    module = _module(generate_python(formula, partials))
+    assert module.OUTPUTS == ("f_1", "f_2", "f_3")
+
+    compiled = compile_formulas(formula, tuple(partials.items()))
+    args = [values[symbol] for symbol in symbols] + [uncertainties[symbol] for symbol in symbols]
+    value, uncertainty = module.evaluate(*args)
+    np.testing.assert_allclose(np.stack(value, axis=-1), compiled.values(values))
+    np.testing.assert_allclose(np.stack(uncertainty, axis=-1), compiled.uncertainties(values, uncertainties))
+
+
+def test_python_numba_compiles():
+    formula, _, partials, _, _ = _export(FORMULA)
+    code = generate_python(formula, partials, numba=True)
+    assert "@numba.njit" in code
+    compile(code, "generated", "exec")
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="requires gcc")
+def test_c(tmp_path):
+    formula, symbols, partials, values, uncertainties = _export(FORMULA)
+    source = tmp_path / "generated.c"
+    source.write_text(generate_c(formula, partials, latex=FORMULA))
+    library = tmp_path / "generated.so"
+    subprocess.run(["gcc", "-std=c99", "-Wall", "-Werror", "-shared", "-fPIC", str(source), "-o", str(library), "-lm"],
+                   check=True)
+
+    def pointer(array: np.ndarray):
+        return array.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+
+    arrays = [np.ascontiguousarray(values[symbol]) for symbol in symbols]
+    arrays += [np.ascontiguousarray(uncertainties[symbol]) for symbol in symbols]
+    value, uncertainty = np.zeros(5), np.zeros(5)
+    ctypes.CDLL(str(library)).f_evaluate(ctypes.c_size_t(5), *map(pointer, arrays), pointer(value), pointer(uncertainty))
+
+    expected_value, expected_uncertainty = compile_formula(formula, tuple(partials.items())).evaluate(
+        values, uncertainties
+    )
+    np.testing.assert_allclose(value, expected_value)
+    np.testing.assert_allclose(uncertainty, expected_uncertainty)
@@ -0,0 +1,18 @@
+import numpy as np
+from sympy import symbols
+
+from derivix.evaluation.compiled import CompiledFormula
+
+x, y = symbols("x y")
+
+
+def test_jacobian():
+    compiled = CompiledFormula(x * y, {x: y, y: x})
+    np.testing.assert_array_equal(compiled.jacobian({x: np.arange(3.0), y: 2}), [[2, 0], [2, 1], [2, 2]])
+
+
+def test_jacobian_without_measurands():
+    compiled = CompiledFormula(x * y, {})
+    values = {x: np.arange(3.0), y: 2}
+    assert compiled.jacobian(values).shape == (3, 0)
+    np.testing.assert_array_equal(compiled.correlated_uncertainty(values, np.empty((0, 0))), [0, 0, 0])
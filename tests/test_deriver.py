@@ -0,0 +1,77 @@
+import pytest
+from sympy import Symbol, Tuple, symbols, sin, cos, diff
+
+from derivix import deriver
+from derivix.deriver import parse_formula, eliminate_common_subexpressions, definitions_to_latex, latex_to_svgs, \
+    DerivationStore
+from derivix.rendering import PREVIEW_SETTINGS
+from derivix.rendering.cache import RenderCache
+from derivix.rendering.pool import RenderError
+
+a, b = Symbol("a"), Symbol("b")
+
+
+def test_parse_single_formula():
+    assert parse_formula(r"\frac{a}{b}") == a / b
+
+
+def test_parse_multiple_formulas():
+    assert parse_formula("a + b; a - b") == Tuple(a + b, a - b)
+
+
+def test_parse_spacing_command_is_no_separator():
+    assert parse_formula(r"a \; b") == a * b
+    assert parse_formula(r"a \; b; a") == Tuple(a * b, a)
+
+
+def test_common_subexpressions_are_pulled_out():
+    x, y, z = symbols("x y z")
+    inner = x * y + z ** 2
+    definitions, reduced = eliminate_common_subexpressions({x: sin(inner) ** 3 * cos(inner) ** 2, y: x})
+    (auxiliary, definition), = definitions
+    assert definition == inner
+    assert reduced == {x: sin(auxiliary) ** 3 * cos(auxiliary) ** 2, y: x}
+
+
+def test_small_subexpressions_stay_inline():
+    x, y = symbols("x y")
+    formula = sin(x + y) * cos(x + y)
+    assert eliminate_common_subexpressions({x: formula}) == ([], {x: formula})
+
+
+def test_auxiliary_names_do_not_clash_with_symbols():
+    x, y, z, a = symbols("x y z A_0")
+    inner = x * y + z ** 2
+    definitions, reduced = eliminate_common_subexpressions({x: a * sin(inner) * cos(inner)})
+    assert definitions_to_latex(definitions) == ["A_{1} = x y + z^{2}"]
+    assert reduced[x].subs(definitions[0][0], inner) == a * sin(inner) * cos(inner)
+
+
+def test_renders_of_other_formulas_are_kept_when_one_fails(tmp_path):
+    cache = RenderCache(tmp_path, 1 << 20)
+    with pytest.raises(RenderError) as info:
+        latex_to_svgs(["a", r"\frac{", "a"], PREVIEW_SETTINGS, cache=cache)
+    assert list(info.value.errors) == [1]
+    assert info.value.svgs[0] == info.value.svgs[2] == cache.load("a", PREVIEW_SETTINGS)
+    assert cache.load(r"\frac{", PREVIEW_SETTINGS) is None
+
+
+def test_store_only_derives_missing_symbols(monkeypatch):
+    x, y, z = symbols("x y z")
+    derived = list()
+    monkeypatch.setattr(deriver, "_derive", lambda formula, symbol: derived.append(symbol) or diff(formula, symbol))
+    store = DerivationStore(x * y * z)
+    store.derive([x, y])
+    assert derived == [x, y]
+
+    partials = list(store.iter_derive([z, y]))
+    assert derived == [x, y, z]
+    assert partials == [(y, x * z), (z, x * y)]
+    # ↑ The memoized derivation comes first, regardless of the order of the symbols.
+
+
+def test_store_keeps_memoized_partials():
+    x, y = symbols("x y")
+    store = DerivationStore(x * y)
+    store.memoize({x: Symbol("restored")})
+    assert store.derive([x, y]) == {x: Symbol("restored"), y: x}
@@ -0,0 +1,25 @@
+import io
+
+import numpy as np
+
+from derivix.gui_elements.measurement_table import _parse_table
+
+
+def test_parse_complete_table():
+    table = _parse_table(io.StringIO("1\t2\n3\t4\n"))
+    np.testing.assert_array_equal(table, [[1, 2], [3, 4]])
+
+
+def test_parse_empty_and_invalid_cells():
+    table = _parse_table(io.StringIO("1,,x\n\n3\n"))
+    np.testing.assert_array_equal(table, [[1, np.nan, np.nan], [3, np.nan, np.nan]])
+
+
+def test_parse_quoted_cells():
+    table = _parse_table(io.StringIO('"1.5","2"\n"3",""\n'), delimiter=",")
+    np.testing.assert_array_equal(table, [[1.5, 2], [3, np.nan]])
+
+
+def test_parse_pads_columns():
+    table = _parse_table(io.StringIO("1;2\n"), delimiter=";", columns=3)
+    np.testing.assert_array_equal(table, [[1, 2, np.nan]])
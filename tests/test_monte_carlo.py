@@ -0,0 +1,41 @@
+import numpy as np
+from sympy import symbols, sqrt
+
+from derivix.deriver import Formula
+from derivix.evaluation.monte_carlo import monte_carlo
+
+x, y = symbols("x y")
+
+
+def _draws(seed: int, chunk_sizes: list[int], value: float, uncertainty: float) -> np.ndarray:
+    """Draws the samples of a single symbol the way `monte_carlo` does for chunks of the `chunk_sizes`."""
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    return np.concatenate([
+        np.random.default_rng(chunk_seed).normal(value, uncertainty, size)
+        for size, chunk_seed in zip(chunk_sizes, seeds)
+    ])
+
+
+def test_merged_chunks_match_all_samples_at_once():
+    result = monte_carlo(Formula(x ** 2 + y, "x^2 + y"), {x: 3, y: 1}, {x: 0.5}, samples=1000, chunk_size=300,
+                         seed=1)
+    samples = _draws(1, [300, 300, 300, 100], 3, 0.5) ** 2 + 1
+    assert result.samples == 1000
+    assert np.isclose(result.mean, samples.mean(), rtol=1e-12)
+    assert np.isclose(result.std, samples.std(ddof=1), rtol=1e-12)
+
+
+def test_seeded_result_does_not_depend_on_processes():
+    formula = Formula(x * y, "x y")
+    arguments = ({x: 2, y: 3}, {x: 0.1, y: 0.2})
+    serial = monte_carlo(formula, *arguments, samples=4000, chunk_size=1000, seed=7)
+    parallel = monte_carlo(formula, *arguments, samples=4000, chunk_size=1000, seed=7, processes=2)
+    assert serial == parallel
+
+
+def test_non_finite_samples_are_counted_as_invalid():
+    result = monte_carlo(Formula(sqrt(x), r"\sqrt{x}"), {x: 0}, {x: 1}, samples=1000, chunk_size=400, seed=3)
+    negative = int((_draws(3, [400, 400, 200], 0, 1) < 0).sum())
+    assert 0 < negative < 1000
+    assert result.invalid == negative
+    assert result.samples == 1000 - negative
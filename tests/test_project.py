@@ -0,0 +1,72 @@
+import pytest
+from sympy import Tuple, srepr
+
+from derivix.deriver import parse_formula, derive_by_symbols
+from derivix.project import Project, SymbolState, DerivationState, save_project, load_project, _expression
+
+
+@pytest.mark.parametrize("latex", [r"\frac{x^2}{y} \cdot \sin(z)", r"a b; a^2 + \sqrt{c}"])
+def test_round_trip(tmp_path, latex):
+    formula = parse_formula(latex)
+    symbols = sorted(formula.free_symbols, key=lambda symbol: symbol.name)
+    partials = derive_by_symbols(formula, symbols[:2])
+    derivation = DerivationState(
+        symbols=[symbol.name for symbol in symbols[:2]],
+        gaussian_latex=[r"\Delta f = 0"],
+        definitions_latex=[],
+        svgs=[b"<svg>gaussian</svg>"],
+        partials_latex=[r"\frac{\partial f}{\partial a} = b"],
+        partial_svgs={0: b"<svg>partial</svg>"},
+    )
+    project = Project(
+        latex=latex,
+        formula=formula,
+        svg=b"<svg>formula</svg>",
+        partials=partials,
+        symbols=[SymbolState(symbols[0].name, True, 1.5, 0.1), SymbolState(symbols[1].name, False)],
+        derivation=derivation,
+    )
+    file = tmp_path / "project.derivix"
+    save_project(project, file)
+    loaded = load_project(file)
+
+    assert loaded.latex == latex
+    assert loaded.svg == project.svg
+    assert loaded.formula.doit() == formula.doit()
+    assert isinstance(loaded.formula, Tuple) == isinstance(formula, Tuple)
+    assert {symbol: partial.doit() for symbol, partial in loaded.partials.items()} == partials
+    assert loaded.symbols == project.symbols
+    assert loaded.derivation == derivation
+    assert loaded.symbol(symbols[0].name) == symbols[0]
+
+
+def test_rejects_code(tmp_path):
+    formula = parse_formula("x")
+    file = tmp_path / "project.derivix"
+    save_project(Project("x", formula, None, {}, []), file)
+    file.write_text(file.read_text().replace(srepr(formula), "__import__('os').getcwd()"))
+    with pytest.raises(ValueError):
+        load_project(file)
+
+
+@pytest.mark.parametrize("template", [
+    "{}",
+    "sin({!r})",
+    "Max({!r}, Integer(1))",
+    "Add(Symbol('x'), Tuple(({!r},)))",
+    "Symbol('x', real={!r})",
+    "Function('f')({!r})",
+])
+def test_rejects_text_evaluated_as_code(tmp_path, template):
+    marker = tmp_path / "marker"
+    payload = f"__import__('pathlib').Path({str(marker)!r}).touch()"
+    with pytest.raises(ValueError):
+        _expression(template.format(payload))
+    assert not marker.exists()
+
+
+def test_rejects_other_files(tmp_path):
+    file = tmp_path / "project.derivix"
+    file.write_text("[]")
+    with pytest.raises(ValueError):
+        load_project(file)
@@ -0,0 +1,76 @@
+import json
+
+from derivix.rendering import RenderSettings, PREVIEW_SETTINGS
+from derivix.rendering.cache import RenderCache
+
+SETTINGS = RenderSettings()
+
+
+def test_put_and_load(tmp_path):
+    cache = RenderCache(tmp_path)
+    assert cache.load("a", SETTINGS) is None
+    file = cache.put("a", SETTINGS, b"<svg>a</svg>")
+    assert file.read_bytes() == b"<svg>a</svg>"
+    assert cache.load("a", SETTINGS) == b"<svg>a</svg>"
+    assert cache.load("a", PREVIEW_SETTINGS) is None
+    assert ("a", SETTINGS) in cache and len(cache) == 1 and cache.size == 12
+
+
+def test_index_persists(tmp_path):
+    cache = RenderCache(tmp_path)
+    cache.put("a", SETTINGS, b"a")
+    cache.save_index()
+    assert RenderCache(tmp_path).load("a", SETTINGS) == b"a"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=2)
+    cache.put("a", SETTINGS, b"a")
+    cache.put("b", SETTINGS, b"b")
+    cache.get("a", SETTINGS)
+    cache.put("c", SETTINGS, b"c")
+    assert cache.load("a", SETTINGS) == b"a"
+    assert cache.load("b", SETTINGS) is None
+    assert cache.load("c", SETTINGS) == b"c"
+    assert sorted(file.name for file in tmp_path.glob("*.svg")) == sorted(
+        cache.key(formula, SETTINGS) + ".svg" for formula in "ac"
+    )
+
+
+def test_never_evicts_the_render_being_stored(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=2)
+    cache.put("a", SETTINGS, b"a")
+    assert cache.put("b", SETTINGS, b"bbb") is None
+    assert cache.load("a", SETTINGS) == b"a"
+    assert cache.load("b", SETTINGS) is None
+
+
+def test_index_writes_are_batched(tmp_path):
+    cache = RenderCache(tmp_path)
+    cache.save_interval = 60
+    cache.put("a", SETTINGS, b"a")
+    assert not (tmp_path / RenderCache.index_name).exists()
+    cache.save_index()
+    assert len(json.loads((tmp_path / RenderCache.index_name).read_text())) == 1
+
+
+def test_processes_keep_the_renders_of_each_other(tmp_path):
+    first, second = RenderCache(tmp_path), RenderCache(tmp_path)
+    first.put("a", SETTINGS, b"a")
+    second.put("b", SETTINGS, b"b")
+    first.save_index()
+    second.save_index()
+    assert second.load("a", SETTINGS) == b"a"
+    assert len(list(tmp_path.glob("*.svg"))) == 2
+    assert len(json.loads((tmp_path / RenderCache.index_name).read_text())) == 2
+
+    third = RenderCache(tmp_path)
+    assert third.load("a", SETTINGS) == b"a" and third.load("b", SETTINGS) == b"b"
+
+
+def test_adopts_renders_missing_from_the_index(tmp_path):
+    RenderCache(tmp_path).put("a", SETTINGS, b"a")
+    # ↑ Never writes its index, like a process that was killed.
+    cache = RenderCache(tmp_path)
+    assert cache.load("a", SETTINGS) == b"a"
+    assert cache.size == 1
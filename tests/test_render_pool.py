@@ -0,0 +1,41 @@
+import pytest
+
+from derivix.rendering import PREVIEW_SETTINGS
+from derivix.rendering.batch import render_svgs
+from derivix.rendering.pool import RenderPool, RenderError
+
+
+def test_no_replacement_after_close():
+    pool = RenderPool(1)
+    pool.start()
+    process = pool._all[0]
+    pool.close()
+    pool._replace(process)
+    # ↑ As done by a render that was still running when the pool was closed.
+    assert pool._all == []
+    assert not process.alive
+
+
+def test_renders_each_formula_in_the_pool_and_reports_failures_per_formula():
+    pool = RenderPool(1)
+    try:
+        with pytest.raises(RenderError) as info:
+            render_svgs(["a", r"\frac{", "b"], PREVIEW_SETTINGS, pool=pool)
+    finally:
+        pool.close()
+    assert list(info.value.errors) == [1]
+    assert info.value.svgs[1] is None
+    assert all(svg.startswith(b"<?xml") for svg in (info.value.svgs[0], info.value.svgs[2]))
+
+
+def test_starts_processes_on_demand():
+    pool = RenderPool(2)
+    try:
+        assert pool._all == []
+        pool.render("a", PREVIEW_SETTINGS)
+        assert len(pool._all) == 1
+        # ↑ The process of the first render is idle again, so the second one reuses it.
+        pool.render("b", PREVIEW_SETTINGS)
+        assert len(pool._all) == 1
+    finally:
+        pool.close()